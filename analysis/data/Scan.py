@@ -1,4 +1,5 @@
 from pathlib import Path
+import re
 import yaml
 import atexit
 import hashlib
@@ -7,14 +8,18 @@ import base64
 import numpy as np
 import pandas as pd
 
-from .load import FileHDF5
+from .load import FileHDF5, ScanHDF5
 
 class Scan():
 
     TYPE_HDF5 = 'hdf5'
+    TYPE_HDF5_SCAN = 'hdf5-scan'
+    # Entries without curves, e.g. only features measured by the scope
+    TYPE_NONE = 'none'
 
     FUNCTIONS = ['max()', 'min()', 'integral()']
-    CURVES = ['curve[0]', 'curve[1]']
+    # Any curve of an entry: curve[0], curve[1], ...
+    CURVE_REG = r'^curve\[(\d+)\]$'
 
     def __init__(self, folder, preprocess=None, use_cache=True, update_cache=True):
         self.folder = Path(folder)
@@ -32,6 +37,9 @@ class Scan():
 
         self._pp = preprocess
 
+        # Shared file of single-file scans, opened on first access
+        self._container = None
+
         self._use_cache = use_cache
         self._cache = {}
         self._cacheChanged = False
@@ -105,6 +113,12 @@ class Scan():
 
         if type == self.TYPE_HDF5:
             return FileHDF5(self.data / prefix)
+        elif type == self.TYPE_HDF5_SCAN:
+            if self._container is None:
+                self._container = ScanHDF5.Container(self.data)
+            return ScanHDF5(self.data / prefix, self._container)
+        elif type == self.TYPE_NONE:
+            raise Exception(f'{self.folder}: Entry [{entry}] has no stored curves!')
         else:
             raise Exception(f'Unknown entry type [{type}]')
 
@@ -118,11 +132,12 @@ class Scan():
 
         for key in other_keys:
 
-            if key in self.CURVES:
+            curve = re.search(self.CURVE_REG, key)
+            if curve:
                 time_data = []
                 amplitude_data = []
 
-                number = int(key.split('[', 1)[1].replace(']', ''))
+                number = int(curve.group(1))
 
                 for index, line in list_data.iterrows():
                     time, amplitude = self._getCurve(index, number)
@@ -36,10 +36,22 @@ class FileHDF5(TCTData):
         if idx >= self._count:
             return None
 
-        data = np.array(self.stream['curves'][f'curve{idx:06d}'])
+        dataset = self.stream['curves'][f'curve{idx:06d}']
+
+        if dataset.attrs.get('encoding') == 'int16':
+            # Raw ADC codes: time and amplitude are reconstructed from the attributes
+            codes = np.array(dataset)
+            time = dataset.attrs['encoding.start'] + dataset.attrs['encoding.interval']*np.arange(len(codes))
+            amplitude = dataset.attrs['encoding.gain']*codes.astype(np.float64) - dataset.attrs['encoding.offset']
+
+            return np.vstack((time, amplitude))
+
+        data = np.array(dataset)
         return data.T
 
     def copy(self, target):
         target_file = target.parent / f'{target.name}.hdf5'
 
         shutil.copy2(self.file, target_file)
+
+        return 'hdf5'
@@ -0,0 +1,154 @@
+import h5py
+import numpy as np
+
+from .TCTData import TCTData
+
+class ScanHDF5(TCTData):
+    """Entry of a scan, where all entries are stored in a single HDF5 file (`data/scan.hdf5`)."""
+
+    FILE = 'scan.hdf5'
+
+    class Container():
+        """Read access to the file shared by all entries.
+
+        The curve index and the entry table are read once, the curves themselves
+        are only loaded on request."""
+
+        def __init__(self, folder):
+            self.file = folder / ScanHDF5.FILE
+
+            self.stream = None
+            self._curves = None
+            self._entries = None
+            self._encoding = None
+            self._raw = None
+
+        def load(self):
+            if self.stream is None:
+                self.stream = h5py.File(self.file, 'r')
+
+                index = self.stream['curves']['index']
+                entries = index['entry'].asstr()[:]
+                numbers = index['curve'][:].astype(int)
+                lengths = index['length'][:].astype(int)
+
+                # Encoding of each row, the parameters only exist if raw curves are stored
+                self._encoding = index['encoding'].asstr()[:]
+                self._raw = {key: index[key][:] for key in ['gain', 'offset', 'interval', 'start'] if key in index}
+
+                self._curves = {}
+                for row, (entry, number, length) in enumerate(zip(entries, numbers, lengths)):
+                    self._curves.setdefault(entry, {})[number] = (row, length)
+
+                prefixes = self.stream['entries']['_prefix'].asstr()[:]
+                self._entries = {prefix: row for row, prefix in enumerate(prefixes)}
+
+        def curves(self, prefix):
+            self.load()
+            return self._curves.get(prefix, {})
+
+        def isRaw(self, row):
+            self.load()
+            return self._encoding[row] == 'int16'
+
+        def codes(self, row, length):
+            self.load()
+
+            raw = {key: values[row] for key, values in self._raw.items()}
+            return self.stream['curves']['codes'][row, :length], raw
+
+        def curve(self, row, length):
+            self.load()
+
+            if self.isRaw(row):
+                # Raw ADC codes: time and amplitude are reconstructed from the encoding parameters
+                codes, raw = self.codes(row, length)
+                time = raw['start'] + raw['interval']*np.arange(length)
+                amplitude = raw['gain']*codes.astype(np.float64) - raw['offset']
+            else:
+                time = self.stream['curves']['time'][row, :length]
+                amplitude = self.stream['curves']['amplitude'][row, :length]
+
+            return np.vstack((time, amplitude))
+
+        def _row(self, group, row):
+            data = {}
+            for key, dataset in group.items():
+                if h5py.check_string_dtype(dataset.dtype) is not None:
+                    data[key] = dataset.asstr()[row]
+                else:
+                    data[key] = dataset[row]
+
+            return data
+
+        def metadata(self, prefix):
+            self.load()
+
+            if prefix not in self._entries:
+                return {}
+
+            return self._row(self.stream['entries'], self._entries[prefix])
+
+        def curveMetadata(self, row):
+            self.load()
+            return self._row(self.stream['curves']['meta'], row)
+
+        def close(self):
+            if self.stream:
+                self.stream.close()
+                self.stream = None
+
+        def __del__(self):
+            self.close()
+
+
+    def __init__(self, prefix, container=None):
+        super().__init__(prefix)
+
+        if container is None:
+            container = ScanHDF5.Container(prefix.parent)
+        self._container = container
+
+    def metadata(self):
+        return self._container.metadata(self.prefix.name)
+
+    def count(self):
+        return len(self._container.curves(self.prefix.name))
+
+    def curve(self, idx):
+        curves = self._container.curves(self.prefix.name)
+
+        if idx not in curves:
+            return None
+
+        return self._container.curve(*curves[idx])
+
+    def copy(self, target):
+        # Exported as a single entry file (same layout as `FileHDF5`)
+        target_file = target.parent / f'{target.name}.hdf5'
+
+        with h5py.File(target_file, 'w') as stream:
+            for key, value in self.metadata().items():
+                if key != '_prefix':
+                    stream.attrs[key] = value
+
+            curves_group = stream.create_group('curves')
+            curves = self._container.curves(self.prefix.name)
+            curves_group.attrs['count'] = len(curves)
+
+            for idx, (row, length) in sorted(curves.items()):
+                if self._container.isRaw(row):
+                    codes, raw = self._container.codes(row, length)
+                    curve = curves_group.create_dataset(f'curve{idx:06d}', data=codes)
+
+                    curve.attrs['encoding'] = 'int16'
+                    for key, value in raw.items():
+                        curve.attrs[f'encoding.{key}'] = value
+                else:
+                    data = self._container.curve(row, length).T
+                    curve = curves_group.create_dataset(f'curve{idx:06d}', data=data)
+
+                for key, value in self._container.curveMetadata(row).items():
+                    curve.attrs[key] = value
+
+        return 'hdf5'
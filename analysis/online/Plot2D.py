@@ -62,6 +62,12 @@ class Plot2D(Plot):
             x = np.array(self.transform(self.definition.x, data[self.definition.x]))
             y = np.array(self.transform(self.definition.plot, data[self.definition.plot]))
 
+            # Scans in snake order yield decreasing x values for every other group.
+            # The fit initialisation assumes increasing values.
+            if len(x) > 1 and np.all(np.diff(x) < 0):
+                x = x[::-1]
+                y = y[::-1]
+
             # TODO: Add support for log scaling of axis
 
             linestyle = '-'
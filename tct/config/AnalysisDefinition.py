@@ -33,10 +33,19 @@ class AnalysisDefinition():
         'laser.frequency': ('Laser Rate', 'Rate', 'kHz', 1e-3),
         'amp.gain': ('Amplifier Gain', 'Gain', '%', 1),
         'scope.average': ('Oscilloscope Average', 'Average', '-', 1),
+        'scope.sweeps': ('Oscilloscope Sweeps', 'Sweeps', '-', 1),
+        'scope.clipped': ('Oscilloscope Clipped', 'Clipped', '', 1),
         'min()': ('Minimum Amplitude', 'max()', 'mV', 1e3),
         'max()': ('Maximum Amplitude', 'min()', 'mV', 1e3),
         'integral()': ('Pulse Integral', 'integral()', 'arb', 1e9),
+        'scope.measure.max': ('Maximum Amplitude (Scope)', 'max', 'mV', 1e3),
+        'scope.measure.min': ('Minimum Amplitude (Scope)', 'min', 'mV', 1e3),
+        'scope.measure.integral': ('Pulse Integral (Scope)', 'integral', 'arb', 1e9),
+        'scope.measure.amplitude': ('Pulse Amplitude (Scope)', 'amplitude', 'mV', 1e3),
+        'scope.measure.risetime': ('Rise Time (Scope)', 'risetime', 'ps', 1e12),
+        'scope.measure.falltime': ('Fall Time (Scope)', 'falltime', 'ps', 1e12),
         'count': ('Repetition', 'Repeat', '', 1),
+        'settle.time': ('Settle Time', 'Settle', 's', 1),
         'time': ('Time', 'Time', '', 1),
         'temp.holder.stage': ('Stage Temperature', 'Stage', '°C', 1),
         'temp.holder.temperature': ('Holder Temperature', 'Holder', '°C', 1),
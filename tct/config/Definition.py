@@ -45,3 +45,235 @@ class MODE:
 
     def __str__(self):
         return f'Mode [{self.mode}]'
+
+
+class OUTPUT:
+    HDF5 = 'hdf5'
+    HDF5_SCAN = 'hdf5-scan'
+
+    # Waveform encodings
+    FLOAT = 'float'
+    INT16 = 'int16'
+
+    def __init__(self, config):
+        # Either only the type or a dict with the type and further options
+        if isinstance(config, dict):
+            type = config.get('type')
+            encoding = config.get('encoding')
+        else:
+            type = config
+            encoding = None
+
+        if type is None:
+            self.type = self.HDF5
+        else:
+            type = type.strip().lower()
+            if type in [self.HDF5, self.HDF5_SCAN]:
+                self.type = type
+            else:
+                raise Exception(f'Output type [{type}] is not supported!')
+
+        if encoding is None:
+            self.encoding = self.FLOAT
+        else:
+            encoding = encoding.strip().lower()
+            if encoding in [self.FLOAT, self.INT16]:
+                self.encoding = encoding
+            else:
+                raise Exception(f'Output encoding [{encoding}] is not supported!')
+
+    def raw(self):
+        return self.encoding == self.INT16
+
+    def __str__(self):
+        return f'Output [{self.type} / {self.encoding}]'
+
+
+class SCOPE:
+
+    def __init__(self, config):
+        if config is None:
+            config = {}
+        elif not isinstance(config, dict):
+            raise Exception('Scope definition needs to be a dict!')
+
+        # Number of triggers captured per entry in sequence mode
+        segments = config.get('sequence')
+        if segments is None or segments is False:
+            self.segments = 1
+        else:
+            try:
+                self.segments = int(segments)
+            except (TypeError, ValueError):
+                raise Exception(f'Scope sequence [{segments}] needs to be a number of segments!')
+            if self.segments < 1:
+                raise Exception(f'Scope sequence [{segments}] needs at least one segment!')
+
+        # Adaptive averaging: stop once the relative error of the figure of merit is reached
+        adaptive = config.get('adaptive')
+        self.fom = None
+        if adaptive is not None:
+            if not isinstance(adaptive, dict) or 'error' not in adaptive:
+                raise Exception('Scope adaptive averaging needs a dict with at least the target [error]!')
+
+            self.fom = str(adaptive.get('fom', 'integral')).strip().lower().replace('()', '')
+            try:
+                self.error = float(adaptive['error'])
+                self.min_sweeps = int(adaptive.get('min', 16))
+            except (TypeError, ValueError):
+                raise Exception('Scope adaptive [error] and [min] need to be numbers!')
+
+            if self.fom not in ['max', 'min', 'integral']:
+                raise Exception(f'Scope adaptive figure of merit [{self.fom}] is not supported!')
+            if self.error <= 0:
+                raise Exception('Scope adaptive [error] must be positive!')
+            if self.sequence():
+                raise Exception('Scope adaptive averaging can not be combined with the sequence mode!')
+
+        # Acquired channels, each one is stored as a separate curve. The first one is used for the averaging and scaling.
+        channels = config.get('channels', ['C2'])
+        if not isinstance(channels, list):
+            channels = [channels]
+        self.channels = [str(channel).strip().upper() for channel in channels]
+        for channel in self.channels:
+            if channel not in ['C1', 'C2', 'C3', 'C4']:
+                raise Exception(f'Scope channel [{channel}] is not valid!')
+        if len(self.channels) < 1 or len(set(self.channels)) != len(self.channels):
+            raise Exception('Scope channels need to be a list of distinct channels!')
+
+        # Buffered mode: the averaged trace is stored in a scope memory and read in the background
+        self.buffered = bool(config.get('buffered', False))
+        if self.buffered and (self.sequence() or self.adaptive() or len(self.channels) > 1):
+            raise Exception('Scope buffered mode can not be combined with the sequence mode, adaptive averaging or several channels!')
+
+        # Transfer window of the waveform in points of the record: {first: .., points: .., sparsing: ..}
+        window = config.get('window')
+        self.window = None
+        if window is not None:
+            if not isinstance(window, dict) or any(key not in ['first', 'points', 'sparsing'] for key in window):
+                raise Exception('Scope window needs to be a dict of [first], [points] and [sparsing]!')
+            try:
+                self.window = {key: int(value) for key, value in window.items()}
+            except (TypeError, ValueError):
+                raise Exception('Scope window [first], [points] and [sparsing] need to be integers!')
+
+            if self.window.get('first', 0) < 0 or self.window.get('points', 0) < 0 or self.window.get('sparsing', 1) < 1:
+                raise Exception('Scope window [first] and [points] must not be negative and [sparsing] at least 1!')
+            if self.sequence():
+                raise Exception('Scope window can not be combined with the sequence mode!')
+
+        # Feature mode: only the results of scope measurements are transferred, the waveform
+        # only every N-th entry (`every`) or when a feature crosses a threshold (`threshold`).
+        # The features are listed as scope.measure.max, scope.measure.integral, ... (see `ScopeControl.FEATURES`)
+        features = config.get('features')
+        self.features = None
+        if features is not None:
+            if isinstance(features, list):
+                features = {'parameters': features}
+            if not isinstance(features, dict):
+                raise Exception('Scope features need to be a list of parameters or a dict!')
+
+            parameters = features.get('parameters', ['max', 'min', 'integral'])
+            if not isinstance(parameters, list) or len(parameters) < 1:
+                raise Exception('Scope features [parameters] need to be a list!')
+            self.features = [SCOPE._feature(param) for param in parameters]
+
+            for param in self.features:
+                if param not in ['scope.measure.max', 'scope.measure.min', 'scope.measure.integral', 'scope.measure.amplitude', 'scope.measure.risetime', 'scope.measure.falltime']:
+                    raise Exception(f'Scope feature [{param}] is not supported!')
+
+            threshold = features.get('threshold', {})
+            if not isinstance(threshold, dict):
+                raise Exception('Scope features [threshold] needs to be a dict of a threshold per feature!')
+            try:
+                self.every = int(features.get('every', 0))
+                self.threshold = {SCOPE._feature(key): float(value) for key, value in threshold.items()}
+            except (TypeError, ValueError):
+                raise Exception('Scope features [every] and [threshold] need to be numbers!')
+
+            for param in self.threshold:
+                if param not in self.features:
+                    raise Exception(f'Scope feature threshold [{param}] is not a measured feature!')
+            if self.sequence() or self.adaptive() or self.buffered:
+                raise Exception('Scope features can not be combined with the sequence mode, adaptive averaging or the buffered mode!')
+
+    def _feature(param):
+        # Column of a feature, e.g. max, max() or scope.measure.max: scope.measure.max
+        param = str(param).strip().lower().replace('()', '')
+        return param if param.startswith('scope.measure.') else 'scope.measure.' + param
+
+    def sequence(self):
+        return self.segments > 1
+
+    def adaptive(self):
+        return self.fom is not None
+
+    def featureMode(self):
+        return self.features is not None
+
+    def __str__(self):
+        return f'Scope [channels: {self.channels} / sequence: {self.segments} / adaptive: {self.fom} / buffered: {self.buffered} / features: {self.features}]'
+
+
+class CACHE:
+
+    def __init__(self, config):
+        # Either on / off or a dict with the refresh intervals [s] per key (prefix)
+        self.enabled = True
+        self.refresh = {}
+
+        if config is None or config is True:
+            pass
+        elif config is False:
+            self.enabled = False
+        elif isinstance(config, dict):
+            self.enabled = bool(config.get('enabled', True))
+
+            refresh = config.get('refresh', {})
+            if not isinstance(refresh, dict):
+                raise Exception('Cache refresh needs to be a dict of intervals per key!')
+
+            for key, value in refresh.items():
+                try:
+                    self.refresh[KEY_MAP.get(key, key)] = None if value is None else float(value)
+                except (TypeError, ValueError):
+                    raise Exception(f'Cache refresh interval [{value}] of key [{key}] is not a number!')
+        else:
+            raise Exception('Cache definition needs to be a boolean or a dict!')
+
+    def __str__(self):
+        return f'Cache [{"on" if self.enabled else "off"} / refresh: {self.refresh}]'
+
+
+class REFINE:
+
+    def __init__(self, config):
+        # Adaptive refinement of the innermost scan parameter, off if not present
+        self.fom = None
+        if config is None or config is False:
+            return
+        if not isinstance(config, dict) or 'points' not in config:
+            raise Exception('Refine definition needs a dict with at least the budget of [points] per row!')
+
+        self.fom = str(config.get('fom', 'integral')).strip().lower().replace('()', '')
+        try:
+            self.points = int(config['points'])
+            self.tolerance = float(config.get('tolerance', 0.05))
+            self.min_step = config.get('min-step')
+            if self.min_step is not None:
+                self.min_step = float(self.min_step)
+        except (TypeError, ValueError):
+            raise Exception('Refine [points], [tolerance] and [min-step] need to be numbers!')
+
+        if self.fom not in ['max', 'min', 'integral']:
+            raise Exception(f'Refine figure of merit [{self.fom}] is not supported!')
+        if self.tolerance <= 0 or self.tolerance >= 1:
+            raise Exception('Refine [tolerance] must be between 0 and 1!')
+
+    def enabled(self):
+        return self.fom is not None
+
+    def __str__(self):
+        if not self.enabled():
+            return 'Refine [off]'
+        return f'Refine [{self.fom}() / points: {self.points} / tolerance: {self.tolerance}]'
@@ -1,9 +1,10 @@
 import re
 import numpy as np
 
-from ..system import Scan
+from ..system import Scan, AdaptiveScan, Settle
+from ..data import FigureOfMerit
 from .ConfigFile import ConfigFile
-from .Definition import SETUP_KEYS, MODE
+from .Definition import SETUP_KEYS, MODE, OUTPUT, SCOPE, CACHE, REFINE
 from .AnalysisDefinition import AnalysisDefinition
 
 class ScanFile(ConfigFile):
@@ -22,11 +23,16 @@ class ScanFile(ConfigFile):
         # Load all the data - This also verifies the file
         self.mode = self._getMode()
         self.delay = self._getDelay()
+        self.output = self._getOutput()
+        self.cache = self._getCache()
         self.meta = self._getMeta()
         self.limits = self._getLimits()
         self.setup = self._getSetup()
         self.scope = self._getScope()
         self.end = self._getEnd()
+        self.plan = self._getPlan()
+        self.refine = self._getRefine()
+        self.autofocus = self._getAutoFocus()
         self.getScan()
         self.analysis = self._getAnalysis()
 
@@ -38,6 +44,20 @@ class ScanFile(ConfigFile):
         delay = float(self._get(['delay'], required=False, default=0.0))
         return delay
 
+    def _getOutput(self):
+        output = self._get(['output'], required=False)
+        try:
+            return OUTPUT(output)
+        except Exception as e:
+            raise ConfigFile.ConfigError(self, str(e))
+
+    def _getCache(self):
+        cache = self._get(['cache'], required=False)
+        try:
+            return CACHE(cache)
+        except Exception as e:
+            raise ConfigFile.ConfigError(self, str(e))
+
 
     def _getMeta(self):
         meta = self._get(['meta'], required=True)
@@ -87,23 +107,85 @@ class ScanFile(ConfigFile):
             # Also for 'end' not present or 'end': off / False
             return False
 
-    def _getScope(self):
-        # TODO review
+    def _getPlan(self):
+        # Either `plan: true` or a dict with the cost model parameters to override
+        plan = self._get(['plan'], required=False)
+
+        if plan is None or plan is False:
+            return None
+        elif plan is True:
+            return {}
+        elif isinstance(plan, dict):
+            try:
+                return {key: float(value) for key, value in plan.items()}
+            except (TypeError, ValueError):
+                raise ConfigFile.ConfigError(self, '[plan] values must be numbers!')
+        else:
+            raise ConfigFile.ConfigError(self, '[plan] needs to be a boolean or a dict of cost model parameters!')
+
+    def _getRefine(self):
+        refine = self._get(['refine'], required=False)
+        try:
+            refine = REFINE(refine)
+        except Exception as e:
+            raise ConfigFile.ConfigError(self, str(e))
+
+        # The planner might change the innermost parameter
+        if refine.enabled() and self.plan is not None:
+            raise ConfigFile.ConfigError(self, '[refine] can not be combined with [plan]!')
+        # The adaptive scan always iterates in the given order
+        if refine.enabled() and self._get(['constraints', 'order'], required=False) is not None:
+            raise ConfigFile.ConfigError(self, '[refine] can not be combined with [constraints.order]!')
+        # In feature mode the figure of merit is measured by the scope for every entry
+        if refine.enabled() and self.scope.featureMode() and f'scope.measure.{refine.fom}' not in self.scope.features:
+            raise ConfigFile.ConfigError(self, f'[refine] in feature mode needs the scope feature [{refine.fom}]!')
+
+        return refine
+
+    def _getAutoFocus(self):
+        # Search of the focus before the scan, e.g. {x: 'lin(-0.1, 0.1, 21)', focus: [40, 50]}
+        autofocus = self._get(['autofocus'], required=False)
+        if autofocus is None or autofocus is False:
+            return None
+
+        if not isinstance(autofocus, dict) or 'x' not in autofocus or 'focus' not in autofocus:
+            raise ConfigFile.ConfigError(self, '[autofocus] needs a dict with the edge scan [x] and the focus bracket [focus]!')
+
+        x = autofocus['x']
+        try:
+            x = self._parseScanValues(x if isinstance(x, list) else [x])
+            focus = [float(value) for value in autofocus['focus']]
+            tolerance = float(autofocus.get('tolerance', 0.01))
+        except:
+            raise ConfigFile.ConfigError(self, '[autofocus] values of [x], [focus] and [tolerance] need to be numbers!')
+
+        fom = str(autofocus.get('fom', FigureOfMerit.INTEGRAL)).strip().lower().replace('()', '')
+        if fom not in FigureOfMerit.all:
+            raise ConfigFile.ConfigError(self, f'[autofocus] figure of merit [{fom}] is not supported!')
+        if len(x) < 4:
+            raise ConfigFile.ConfigError(self, '[autofocus] edge scan [x] needs at least 4 values!')
+        if len(focus) != 2 or focus[0] >= focus[1] or tolerance <= 0:
+            raise ConfigFile.ConfigError(self, '[autofocus] needs a bracket [focus: [min, max]] and a positive [tolerance]!')
+
+        # The focus found would be overwritten by the scan
+        for line in self._get(['scan'], required=True):
+            if isinstance(line, dict) and self.translate(list(line.keys())[0], strict=False) == 'stage.focus':
+                raise ConfigFile.ConfigError(self, '[autofocus] can not be combined with a scan of the focus!')
+
+        return {'x': x, 'focus': focus, 'tolerance': tolerance, 'fom': fom}
 
-        # scope = self._get(['scope'], required=True)
-        #
-        # if scope == 'single':
-        #     return {'type': 'single', 'count': 1}
-        # elif 'single' in scope:
-        #     return {'type': 'single', 'count': int(scope['single'])}
-        # elif 'average' in scope:
-        #     return {'type': 'average', 'count': int(scope['average'])}
-        # else:
-        #     raise ConfigFile.ConfigError(self, '[scope] has a bad definition!')
+    def _getScope(self):
+        scope = self._get(['scope'], required=False)
+        try:
+            scope = SCOPE(scope)
+        except Exception as e:
+            raise ConfigFile.ConfigError(self, str(e))
 
-        # average is now part of the state / setup
+        # The scope can not average the segments of a sequence
+        if scope.sequence() and self.setup['scope.average'] != 1:
+            raise ConfigFile.ConfigError(self, '[setup] average must be 1 in sequence mode!')
 
-        pass
+        return scope
 
 
     def _parseScanValues(self, definition, values=None):
@@ -142,13 +224,54 @@ class ScanFile(ConfigFile):
 
         return wait
 
+    def _parseSettle(self, key, wait):
+        # Conditions per measured quantity, e.g. current: {tolerance: 0.02, window: 3}
+        settle = self._get(['constraints', 'settle', key], required=False)
+        if settle is None:
+            return None
+
+        if not isinstance(settle, dict):
+            raise ConfigFile.ConfigError(self, f'Settle conditions for key [{key}] need to be a dict per quantity!')
+        if wait <= 0:
+            raise ConfigFile.ConfigError(self, f'Settle conditions for key [{key}] need a wait as timeout!')
+
+        conditions = []
+        for quantity, definition in settle.items():
+            try:
+                conditions.append(Settle.Condition(quantity, float(definition['window']),
+                    tolerance=definition.get('tolerance'), drift=definition.get('drift')))
+            except ConfigFile.ConfigError:
+                raise
+            except Exception as e:
+                raise ConfigFile.ConfigError(self, f'Settle condition [{quantity}] for key [{key}] is not valid: {e}')
+
+        return conditions
+
     def _parseAutoScale(self, key):
         auto = self._get(['constraints', 'autoscale', key], required=False)
         return bool(auto)
 
+    def _parseOrder(self, key):
+        # Either a single order for all parameters or one per parameter
+        order = self._get(['constraints', 'order'], required=False)
+        if isinstance(order, dict):
+            order = order.get(key)
+
+        if order is None:
+            return Scan.ORDER.NORMAL
+
+        order = str(order).strip().lower()
+        if order not in Scan.ORDER.all:
+            raise ConfigFile.ConfigError(self, f'Order [{order}] for key [{key}] is not valid! Valid: {Scan.ORDER.all}')
+
+        return order
+
 
     def getScan(self):
-        scan = Scan()
+        if self.refine.enabled():
+            scan = AdaptiveScan(self.refine.fom, self.refine.points, self.refine.tolerance, self.refine.min_step)
+        else:
+            scan = Scan()
 
         data = self._get(['scan'], required=True)
         if not isinstance(data, list):
@@ -160,7 +283,9 @@ class ScanFile(ConfigFile):
                 definition = line[key]
 
                 wait = self._parseWait(key)
+                settle = self._parseSettle(key, wait)
                 autoscale = self._parseAutoScale(key)
+                order = self._parseOrder(key)
 
                 # Detect parameter which is iterated manually
                 if key.startswith('manual-'):
@@ -173,11 +298,22 @@ class ScanFile(ConfigFile):
                 if not isinstance(definition, list):
                     definition = [definition]
 
-                scan.addParameter(param, self._parseScanValues(definition), manual=manual, wait=wait, autoscale=autoscale)
+                scan.addParameter(param, self._parseScanValues(definition), manual=manual, wait=wait, autoscale=autoscale,
+                    order=order, start=self.setup.get(param), settle=settle)
 
+            except ConfigFile.ConfigError:
+                raise
             except:
                 raise ConfigFile.ConfigError(self, f'Error while parsing scan entry [{line}]')
 
+        if self.refine.enabled():
+            param = scan.parameters()[-1]
+            values = scan._values[param]
+            if param.startswith('manual-') or len(values) < 2 or not all(isinstance(value, (int, float)) for value in values):
+                raise ConfigFile.ConfigError(self, f'[refine] needs at least two numerical values of the innermost parameter [{param}]!')
+            if len(set(values)) != len(values):
+                raise ConfigFile.ConfigError(self, f'[refine] needs distinct values of the innermost parameter [{param}]!')
+
         return scan
 
     def _getAnalysis(self):
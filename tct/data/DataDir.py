@@ -7,14 +7,25 @@ import slugify
 import yaml
 
 from ..logger import Logger
-from .output import FileHDF5
+from .output import FileHDF5, ScanHDF5
 
 class ScanDir():
 
     TYPES = {
         FileHDF5: 'hdf5',
+        ScanHDF5: 'hdf5-scan',
     }
 
+    # Type of entries without stored curves
+    NO_DATA = 'none'
+
+    def outputType(name):
+        for type, type_name in ScanDir.TYPES.items():
+            if type_name == name:
+                return type
+
+        raise Exception(f'Unknown output type [{name}]!')
+
     def __init__(self, parent, entry, datadir, type=FileHDF5):
         self.entry = entry
 
@@ -32,9 +43,18 @@ class ScanDir():
         self.plot = self.folder / 'plot'
         self.plot.mkdir(exist_ok = False)
 
+        # Shared file for output types storing all entries in one file
+        self._container = self._output.container(self.data)
+
         self._list = []
+        self._timing = []
         self._count = 0
 
+    def close(self):
+        if self._container is not None:
+            self._container.close()
+            self._container = None
+
     def logger(self, print=True, debug=False):
         return Logger(
             [self.datadir.global_log, self.folder / 'log.log'],
@@ -48,26 +68,41 @@ class ScanDir():
         with open(self.meta / 'info.yaml', 'w') as stream:
             yaml.dump(metadata, stream, sort_keys=False)
 
+    def writeTiming(self, timing):
+        # Summary of the time spent in the phases of the scan, see `Timing.summary`
+        with open(self.meta / 'timing.yaml', 'w') as stream:
+            yaml.dump(timing, stream, sort_keys=False)
+
     def writeList(self, list=None):
         # list can be used to pass in an externally generated list
         # For example when concatenating scans
         if list is None:
-            list = self._list
+            # The phase timing is added at last, to include the writing of the entries
+            list = [dict(entry, **(timing.columns() if timing is not None else {})) for entry, timing in zip(self._list, self._timing)]
         data = pd.DataFrame.from_dict(list)
         data.to_csv(self.meta / 'list.csv')
 
-    def addEntry(self, state):
+    def addEntry(self, state, data=True, timing=None):
+        # With data=False only the state is listed (e.g. features measured by the scope), no output entry is created
+        # timing: `Timing.Record` of the entry, listed as timing.* columns
         prefix = f'A{self._count}'
 
         metadata = {
             '_prefix': prefix,
-            '_type': ScanDir.TYPES[self._output],
+            '_type': ScanDir.TYPES[self._output] if data else ScanDir.NO_DATA,
         }
         metadata.update(state)
 
         self._list.append(metadata)
+        self._timing.append(timing)
 
         self._count += 1
+        if not data:
+            return None
+
+        if self._container is not None:
+            return self._container.entry(self.data / prefix)
+
         return self._output(self.data / prefix)
 
 
@@ -81,7 +116,7 @@ class DataDir():
 
         self.global_log = self.folder / 'log.txt'
 
-    def createScan(self, name, date=None):
+    def createScan(self, name, date=None, type=FileHDF5):
         # date can be provide, to be used in data import
 
         if date is None:
@@ -92,7 +127,7 @@ class DataDir():
         slug = slugify.slugify(name, max_length=30)
         entry = f'{date:%Y%m%d-%H%M%S}_{slug}'
 
-        return ScanDir(self.folder, entry, self)
+        return ScanDir(self.folder, entry, self, type=type)
 
     def trash(self, entry):
         trash = self.folder / '_trash'
@@ -0,0 +1,70 @@
+import numpy as np
+
+class FigureOfMerit():
+    """Figure of merit of a waveform together with its statistical uncertainty.
+
+    Calculated like the functions of the analysis (`max()`, `min()`, `integral()`):
+    the baseline (t < 0) is subtracted and only t >= 0 is taken into account.
+    The uncertainty is estimated from the noise of the baseline. For the integral the
+    correlation of neighbouring samples (e.g. by the bandwidth of the amplifier) is taken
+    into account with the autocorrelation of the baseline."""
+
+    MAX = 'max'
+    MIN = 'min'
+    INTEGRAL = 'integral'
+
+    all = [MAX, MIN, INTEGRAL]
+
+    def __init__(self, fom):
+        if fom not in FigureOfMerit.all:
+            raise Exception(f'Unknown figure of merit [{fom}]! Valid: {FigureOfMerit.all}')
+
+        self.fom = fom
+
+    def __str__(self):
+        return f'{self.fom}()'
+
+    def evaluate(self, time, amplitude):
+        baseline = amplitude[time < 0]
+        if len(baseline) < 2:
+            raise Exception('Waveform has no baseline (t < 0) to estimate the noise!')
+
+        noise = np.std(baseline)
+
+        sel = time >= 0
+        signal = amplitude[sel] - np.mean(baseline)
+
+        if self.fom == FigureOfMerit.MAX:
+            return np.max(signal), noise
+        elif self.fom == FigureOfMerit.MIN:
+            return np.min(signal), noise
+        else:
+            # The subtracted mean of the baseline adds to the uncertainty of the integral
+            dt = (time[-1] - time[0])/(len(time) - 1)
+            n, m = len(signal), len(baseline)
+            variance = FigureOfMerit._sumVariance(baseline, n) + (n/m)**2*FigureOfMerit._sumVariance(baseline, m)
+            return np.trapz(signal, time[sel]), dt*np.sqrt(variance)
+
+    def _sumVariance(baseline, n):
+        # Variance of the sum of n correlated samples: var*(n + 2*sum_k (n - k)*rho_k),
+        # the autocorrelation rho_k is taken from the baseline up to its first zero crossing
+        x = baseline - np.mean(baseline)
+        var = np.mean(x**2)
+        if var == 0:
+            return 0.0
+
+        lags = min(n, len(x)//2)
+        rho = np.correlate(x, x, mode='full')[len(x):len(x) + lags - 1]/(len(x) - np.arange(1, lags))/var
+        negative = np.nonzero(rho <= 0)[0]
+        if len(negative) > 0:
+            rho = rho[:negative[0]]
+
+        k = np.arange(1, len(rho) + 1)
+        return var*(n + 2*np.sum((n - k)*rho))
+
+    def relativeError(self, time, amplitude):
+        value, error = self.evaluate(time, amplitude)
+        if value == 0:
+            return np.inf
+
+        return abs(error/value)
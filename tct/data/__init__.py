@@ -1 +1,2 @@
-from .DataDir import DataDir
+from .DataDir import DataDir, ScanDir
+from .FigureOfMerit import FigureOfMerit
@@ -26,6 +26,22 @@ class FileHDF5(TCTOutput):
         for key, value in metadata.items():
             curve.attrs[key] = value
 
+    def storeCurveRaw(self, codes, gain, offset, interval, start, metadata={}):
+        idx = self.curves.attrs['count']
+        self.curves.attrs['count'] = idx+1
+
+        curve = self.curves.create_dataset(f'curve{idx:06d}', data=np.asarray(codes, dtype=np.int16))
+
+        for key, value in metadata.items():
+            curve.attrs[key] = value
+
+        # The time and amplitude are reconstructed from these when loading
+        curve.attrs['encoding'] = 'int16'
+        curve.attrs['encoding.gain'] = gain
+        curve.attrs['encoding.offset'] = offset
+        curve.attrs['encoding.interval'] = interval
+        curve.attrs['encoding.start'] = start
+
     def storeMetaData(self, metadata):
         for key, value in metadata.items():
             self.stream.attrs[key] = value
@@ -0,0 +1,204 @@
+import h5py
+import numpy as np
+
+from .TCTOutput import TCTOutput
+
+class ScanHDF5(TCTOutput):
+    """Stores all entries of a scan in a single HDF5 file (`data/scan.hdf5`).
+
+    File layout:
+        /entries/<key>          Columnar table of the entry metadata (one row per entry)
+        /curves/time            Extendible 2D dataset (one row per curve)
+        /curves/amplitude       Extendible 2D dataset (one row per curve)
+        /curves/codes           Extendible 2D dataset of int16 ADC codes (one row per curve)
+        /curves/index/<key>     Entry prefix, curve number, length and encoding of each curve row
+        /curves/meta/<key>      Columnar table of the curve metadata (one row per curve)
+
+    Float curves are stored in `time` / `amplitude`, raw curves in `codes`.
+    All curve datasets share the same row index, rows not used by a dataset are
+    never written and do not allocate any chunks.
+    Curves shorter than the dataset width are padded with NaN resp. 0."""
+
+    FILE = 'scan.hdf5'
+
+    # Number of rows per chunk (and flush interval)
+    CHUNK = 64
+
+
+    class Table():
+        """Columnar table of extendible 1D datasets, one per key.
+
+        Numbers are stored as float (NaN for missing values), booleans as bool and
+        everything else as string. The type of a column is given by its first value.
+        A column which gets a value of another type (or a missing boolean) is
+        converted to a string column, missing values are stored as empty string."""
+
+        def __init__(self, group, chunk):
+            self.group = group
+            self.chunk = chunk
+            self.rows = group.attrs.get('rows', 0)
+
+        def _dtype(self, value):
+            if isinstance(value, (bool, np.bool_)):
+                return np.bool_
+            elif isinstance(value, (int, float, np.number)):
+                return np.float64
+            else:
+                return h5py.string_dtype()
+
+        def _compatible(self, dataset, value):
+            if h5py.check_string_dtype(dataset.dtype) is not None:
+                return True
+            if value is None:
+                return dataset.dtype == np.float64
+            return dataset.dtype == self._dtype(value)
+
+        def _convert(self, dataset, value):
+            if dataset.dtype == np.float64:
+                return np.nan if value is None else float(value)
+            elif dataset.dtype == np.bool_:
+                return bool(value)
+            else:
+                return '' if value is None else str(value)
+
+        def _create(self, key, value, idx):
+            dtype = self._dtype(value)
+            # The previous rows of a boolean column would read as False
+            if dtype == np.bool_ and idx > 0:
+                dtype = h5py.string_dtype()
+            fill = np.nan if dtype == np.float64 else (False if dtype == np.bool_ else '')
+
+            return self.group.create_dataset(key, shape=(self.rows,), maxshape=(None,),
+                dtype=dtype, chunks=(self.chunk,), fillvalue=fill)
+
+        def _toString(self, key):
+            # The previous values are kept as string
+            values = self.group[key][:]
+            if values.dtype == np.float64:
+                values = ['' if np.isnan(value) else str(value) for value in values]
+            else:
+                values = [str(value) for value in values]
+
+            del self.group[key]
+            dataset = self.group.create_dataset(key, shape=(self.rows,), maxshape=(None,),
+                dtype=h5py.string_dtype(), chunks=(self.chunk,), fillvalue='')
+            dataset[:] = values
+
+            return dataset
+
+        def append(self, row):
+            idx = self.rows
+            self.rows += 1
+            self.group.attrs['rows'] = self.rows
+
+            for key in self.group:
+                self.group[key].resize((self.rows,))
+
+            for key, value in row.items():
+                # The HDF5 path separator can not be used in a dataset name
+                key = key.replace('/', '|')
+
+                if key not in self.group:
+                    if value is None:
+                        continue
+                    self._create(key, value, idx)
+
+                dataset = self.group[key]
+                if not self._compatible(dataset, value):
+                    dataset = self._toString(key)
+                dataset[idx] = self._convert(dataset, value)
+
+            return idx
+
+
+    class Container():
+        """The file shared by all the entries of one scan."""
+
+        def __init__(self, folder):
+            self.file = folder / ScanHDF5.FILE
+            self.stream = h5py.File(self.file, 'w')
+
+            self.entries = ScanHDF5.Table(self.stream.create_group('entries'), ScanHDF5.CHUNK)
+
+            curves = self.stream.create_group('curves')
+            self.index = ScanHDF5.Table(curves.create_group('index'), ScanHDF5.CHUNK)
+            self.meta = ScanHDF5.Table(curves.create_group('meta'), ScanHDF5.CHUNK)
+
+            self.curves = curves
+            self.data = {}
+
+        def entry(self, prefix):
+            return ScanHDF5(prefix, self)
+
+        def _dataset(self, key, dtype, fill):
+            if key not in self.data:
+                self.data[key] = self.curves.create_dataset(key, shape=(0, 0), maxshape=(None, None),
+                    dtype=dtype, chunks=(ScanHDF5.CHUNK, 1024), fillvalue=fill)
+
+            return self.data[key]
+
+        def _addRow(self, prefix, number, length, encoding, metadata):
+            row = self.index.append(dict({'entry': prefix, 'curve': number, 'length': length}, **encoding))
+            self.meta.append(metadata)
+
+            return row
+
+        def _store(self, row, dataset, values):
+            dataset.resize((row+1, max(dataset.shape[1], len(values))))
+            dataset[row, :len(values)] = values
+
+            if (row+1) % ScanHDF5.CHUNK == 0:
+                self.stream.flush()
+
+        def addCurve(self, prefix, number, x, y, metadata):
+            row = self._addRow(prefix, number, len(y), {'encoding': 'float'}, metadata)
+
+            self._store(row, self._dataset('time', np.float64, np.nan), x)
+            self._store(row, self._dataset('amplitude', np.float64, np.nan), y)
+
+        def addCurveRaw(self, prefix, number, codes, gain, offset, interval, start, metadata):
+            encoding = {
+                'encoding': 'int16',
+                'gain': gain,
+                'offset': offset,
+                'interval': interval,
+                'start': start,
+            }
+            row = self._addRow(prefix, number, len(codes), encoding, metadata)
+
+            self._store(row, self._dataset('codes', np.int16, 0), np.asarray(codes, dtype=np.int16))
+
+        def addMetaData(self, prefix, metadata):
+            row = {'_prefix': prefix}
+            row.update(metadata)
+            self.entries.append(row)
+
+        def close(self):
+            if self.stream:
+                self.stream.close()
+                self.stream = None
+
+        def __del__(self):
+            self.close()
+
+
+    def container(folder):
+        return ScanHDF5.Container(folder)
+
+
+    def __init__(self, prefix, container):
+        super().__init__(prefix)
+
+        self._container = container
+        self._count = 0
+
+    def storeCurve(self, x, y, metadata={}):
+        self._container.addCurve(self.prefix.name, self._count, x, y, metadata)
+        self._count += 1
+
+    def storeCurveRaw(self, codes, gain, offset, interval, start, metadata={}):
+        self._container.addCurveRaw(self.prefix.name, self._count, codes, gain, offset, interval, start, metadata)
+        self._count += 1
+
+    def storeMetaData(self, metadata):
+        self._container.addMetaData(self.prefix.name, metadata)
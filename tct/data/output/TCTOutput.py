@@ -1,10 +1,19 @@
 class TCTOutput():
 
+    # Output types which store all entries of a scan in a common file, return
+    # the shared container here. Entries are then created with this container.
+    def container(folder):
+        return None
+
     def __init__(self, prefix):
         self.prefix = prefix
 
     def storeCurve(self, x, y, metadata={}):
         raise NotImplementedError()
 
+    def storeCurveRaw(self, codes, gain, offset, interval, start, metadata={}):
+        # Stores the ADC codes, with: y = gain*codes - offset / x = start + interval*index
+        raise NotImplementedError()
+
     def storeMetaData(self, metadata):
         raise NotImplementedError()
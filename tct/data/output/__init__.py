@@ -1 +1,2 @@
 from .FileHDF5 import FileHDF5
+from .ScanHDF5 import ScanHDF5
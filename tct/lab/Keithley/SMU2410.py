@@ -1,3 +1,5 @@
+import numpy as np
+
 from ..generic import InterfaceSerial
 
 class SMU2410(InterfaceSerial):
@@ -52,6 +54,9 @@ class SMU2410(InterfaceSerial):
         LIST = "LIST"
         SWEEP = "SWE"
 
+    # Readings in the trace buffer
+    BUFFER_SIZE = 2500
+
 
     def __init__(self, port, log, baudrate=9600):
         super().__init__(port, baudrate, log=log)
@@ -102,6 +107,12 @@ class SMU2410(InterfaceSerial):
         resp = self.query("SENSE1:DATA:LATEST?", resp=True).split(',')
         return float(resp[1])
 
+    def measureCurrent(self):
+        # Triggers a single measurement and returns the current in one round trip.
+        # READ? waits for the measurement, it is therefore safe within the compound command.
+        resp = self.batch(["ARM:COUNT 1", "READ?"])[0].split(',')
+        return float(resp[1])
+
 
 
     def setVoltageSourceRange(self, magnitude=20, auto=None):
@@ -201,3 +212,64 @@ class SMU2410(InterfaceSerial):
         return self.query("SOURCE1:FUNCTION:MODE?", resp=True)
     def sourceVoltageMode(self):
         return self.query("SOURCE1:VOLTAGE:MODE?", resp=True)
+
+
+    ## Batched access to the source / sense configuration (single round trip)
+    def configuration(self):
+        values = self.batch([
+            "SOURCE1:FUNCTION:MODE?",
+            "SOURCE1:VOLTAGE:MODE?",
+            "SENSE1:CURRENT:PROTECTION?",
+            "SOURCE1:VOLTAGE:RANGE:AUTO?",
+            "SOURCE1:VOLTAGE:RANGE?",
+            "SENSE1:CURRENT:RANGE:AUTO?",
+            "SENSE1:CURRENT:RANGE?",
+            "SENS1:FUNC:STATE? \"CURRENT\"",
+        ])
+
+        return {
+            'sourceMode': values[0],
+            'sourceVoltageMode': values[1],
+            'currentProtection': float(values[2]),
+            'voltageSourceRange': None if values[3] == '1' else float(values[4]),
+            'currentSenseRange': None if values[5] == '1' else float(values[6]),
+            'currentSense': values[7] == '1',
+        }
+
+    def measureCurrentBuffered(self, count, delay=0):
+        # Takes `count` readings (with `delay` before each) in one armed sequence into the
+        # trace buffer and reads them back in a single transfer.
+        if count < 1 or count > SMU2410.BUFFER_SIZE:
+            raise ValueError(f'Buffered measurement of [{count}] readings, the SMU buffer holds 1 to {SMU2410.BUFFER_SIZE}!')
+
+        values = self.batch([
+            "FORMAT:ELEMENTS?",
+            "TRACE:CLEAR",
+            "TRACE:POINTS %i"%(count),
+            "TRACE:FEED SENSE1",
+            "TRACE:FEED:CONTROL NEXT",
+            "ARM:COUNT 1",
+            "TRIGGER:COUNT %i"%(count),
+            "TRIGGER:DELAY %f"%(delay),
+            "INIT",
+            "*WAI",
+            "TRACE:DATA?",
+            "TRIGGER:COUNT 1",
+            "TRIGGER:DELAY 0",
+            "TRACE:FEED:CONTROL NEVER",
+        ], timeout=InterfaceSerial.TIMEOUT + count*(delay + 0.1))
+
+        elements = values[0].replace('"', '').split(',')
+        data = np.array(values[1].split(','), dtype=float).reshape(-1, len(elements))
+
+        return data[:, elements.index('CURR')]
+
+    def configure(self, source_mode, voltage_mode, current_protection, voltage_range, current_range, current_sense=True):
+        return self.batch([
+            "SOURCE1:FUNCTION:MODE %s"%(source_mode),
+            "SOURCE1:VOLTAGE:MODE %s"%(voltage_mode),
+            "SENSE1:CURRENT:PROTECTION %f"%(current_protection),
+            "SOURCE1:VOLTAGE:RANGE %f"%(voltage_range),
+            "SENSE1:CURRENT:RANGE %f"%(current_range),
+            "SENSE1:FUNC:%s \"CURRENT\""%("ON" if current_sense else "OFF"),
+        ])
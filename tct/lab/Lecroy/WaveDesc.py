@@ -0,0 +1,263 @@
+import copy
+import struct
+import time
+
+import numpy as np
+
+class WaveDesc():
+    """Parser for the binary waveform data sent by LeCroy scopes (`WF?` command / .trc files).
+
+    The data is described by the LECROY_2_3 template (`TMPL?` command).
+    See also Page 6-22 here: https://cdn.teledynelecroy.com/files/manuals/maui-remote-control-and-automation-manual.pdf
+
+    Only the descriptor fields are unpacked. The samples are a read-only numpy
+    view on the received buffer (no copy) and the scaled x / y arrays are only
+    calculated on first access.
+
+    Sequence (segmented) acquisitions contain `subarrayCount` segments of equal
+    length, the trigger time and offset of each segment is stored in the TRIGTIME
+    array. See `segments()` / `segment()`."""
+
+    NAME = b'WAVEDESC'
+    TEMPLATE = 'LECROY_2_3'
+
+    # Offset and struct format of the descriptor fields (relative to the start of WAVEDESC)
+    FIELDS = {
+        'descriptorName':   (0, '16s'),
+        'templateName':     (16, '16s'),
+        'commType':         (32, 'H'),
+        'commOrder':        (34, 'H'),
+        'waveDescriptor':   (36, 'i'),
+        'userText':         (40, 'i'),
+        'trigTimeArray':    (48, 'i'),
+        'risTimeArray':     (52, 'i'),
+        'waveArray1':       (60, 'i'),
+        'instrumentName':   (76, '16s'),
+        'instrumentNumber': (92, 'i'),
+        'traceLabel':       (96, '16s'),
+        'waveArrayCount':   (116, 'i'),
+        'pointsPerScreen':  (120, 'i'),
+        'firstValidPoint':  (124, 'i'),
+        'lastValidPoint':   (128, 'i'),
+        'firstPoint':       (132, 'i'),
+        'sparsingFactor':   (136, 'i'),
+        'segmentIndex':     (140, 'i'),
+        'subarrayCount':    (144, 'i'),
+        'sweepsPerAcq':     (148, 'i'),
+        'verticalGain':     (156, 'f'),
+        'verticalOffset':   (160, 'f'),
+        'maxValue':         (164, 'f'),
+        'minValue':         (168, 'f'),
+        'nominalBits':      (172, 'H'),
+        'horizInterval':    (176, 'f'),
+        'horizOffset':      (180, 'd'),
+        'acqDuration':      (312, 'f'),
+        'recordTypeID':     (316, 'H'),
+        'processingDoneID': (318, 'H'),
+        'timeBaseID':       (324, 'H'),
+        'verticalCouplingID': (326, 'H'),
+        'probeAttenuation': (328, 'f'),
+        'bandwidthLimitID': (334, 'H'),
+        'waveSourceID':     (344, 'H'),
+    }
+
+    TRIGGER_TIME = 296
+    LENGTH = 346
+
+    # Same names as used by `lecroyparser`, so that the stored metadata stays unchanged
+    WAVE_SOURCE = {0: 'Channel 1', 1: 'Channel 2', 2: 'Channel 3', 3: 'Channel 4', 9: 'Unknown'}
+    VERTICAL_COUPLING = ['DC50', 'GND', 'DC1M', 'GND', 'AC1M']
+    BANDWIDTH_LIMIT = ['off', 'on']
+    RECORD_TYPE = ['single_sweep', 'interleaved', 'histogram', 'graph', 'filter_coefficient',
+        'complex', 'extrema', 'sequence_obsolete', 'centered_RIS', 'peak_detect']
+    PROCESSING = ['No Processing', 'FIR Filter', 'interpolated', 'sparsed',
+        'autoscaled', 'no_resulst', 'rolling', 'cumulative']
+
+
+    def _enum(table, idx):
+        try:
+            return table[idx]
+        except (IndexError, KeyError):
+            return 'Unknown'
+
+    def _timeBase(idx):
+        if idx < 48:
+            unit = 'pnum k'[idx // 9].strip()
+            value = [1, 2, 5, 10, 20, 50, 100, 200, 500][idx % 9]
+            return f'{value} {unit}s/div'
+        elif idx == 100:
+            return 'EXTERNAL'
+
+        return 'Unknown'
+
+
+    def __init__(self, data):
+        # Accepts bytes or a memoryview (e.g. of a larger receive buffer)
+        self.data = data
+
+        self.pos = bytes(data[:64]).find(WaveDesc.NAME)
+        if self.pos < 0:
+            raise Exception('Waveform data does not contain a WAVEDESC block!')
+
+        # COMM_ORDER: 0 = big endian, 1 = little endian
+        order = struct.unpack_from('<H', data, self.pos + WaveDesc.FIELDS['commOrder'][0])[0]
+        self.endianness = '<' if order == 1 else '>'
+
+        for name, (offset, format) in WaveDesc.FIELDS.items():
+            value = struct.unpack_from(self.endianness + format, data, self.pos + offset)[0]
+            if isinstance(value, bytes):
+                value = value.split(b'\0', 1)[0].decode('ascii', 'replace')
+            setattr(self, name, value)
+
+        self.recordType = WaveDesc._enum(WaveDesc.RECORD_TYPE, self.recordTypeID)
+        self.processingDone = WaveDesc._enum(WaveDesc.PROCESSING, self.processingDoneID)
+        self.timeBase = WaveDesc._timeBase(self.timeBaseID)
+        self.verticalCoupling = WaveDesc._enum(WaveDesc.VERTICAL_COUPLING, self.verticalCouplingID)
+        self.bandwidthLimit = WaveDesc._enum(WaveDesc.BANDWIDTH_LIMIT, self.bandwidthLimitID)
+        self.waveSource = WaveDesc._enum(WaveDesc.WAVE_SOURCE, self.waveSourceID)
+        self.triggerTime = self._parseTimeStamp(self.pos + WaveDesc.TRIGGER_TIME)
+
+        # COMM_TYPE: 0 = byte, 1 = word
+        dtype = np.dtype(self.endianness + ('i1' if self.commType == 0 else 'i2'))
+
+        start = self.pos + self.waveDescriptor + self.userText + self.trigTimeArray + self.risTimeArray
+        self.samples = np.frombuffer(data, dtype=dtype, count=self.waveArray1 // dtype.itemsize, offset=start)
+
+        # Trigger time (relative to the first segment) and trigger offset per segment
+        start = self.pos + self.waveDescriptor + self.userText
+        self.trigTimes = np.frombuffer(data, dtype=np.dtype(self.endianness + 'f8'),
+            count=self.trigTimeArray // 8, offset=start).reshape(-1, 2)
+        self.segmentTime = 0.0
+
+        self._x = None
+        self._y = None
+
+    def _parseTimeStamp(self, pos):
+        second, minute, hour, day, month, year = struct.unpack_from(self.endianness + 'dBBBBh', self.data, pos)
+        return f'{year}-{month:02d}-{day:02d} {hour:02d}:{minute:02d}:{second:.2f}'
+
+    # Effective time axis, taking a transfer window (first point / sparsing) into account
+    def timeInterval(self):
+        return self.horizInterval * max(1, self.sparsingFactor)
+
+    def timeOffset(self):
+        return self.horizOffset + self.firstPoint * self.horizInterval
+
+    def extent(self):
+        # Minimum and maximum of the scaled samples, without calculating y
+        return (self.verticalGain*float(np.min(self.samples)) - self.verticalOffset,
+            self.verticalGain*float(np.max(self.samples)) - self.verticalOffset)
+
+    def clipped(self):
+        # Samples at the limits of the ADC range (max / min value = upper / lower edge of the grid)
+        return bool(np.max(self.samples) >= self.maxValue or np.min(self.samples) <= self.minValue)
+
+    def segments(self):
+        if self.trigTimeArray > 0 and self.subarrayCount > 1:
+            return min(self.subarrayCount, len(self.trigTimes))
+        return 1
+
+    def segment(self, idx):
+        """Waveform of a single segment of a sequence acquisition (a view, no copy of the samples)."""
+        if idx < 0 or idx >= self.segments():
+            raise IndexError(f'Segment [{idx}] does not exist, the waveform has {self.segments()} segment(s)!')
+
+        wave = copy.copy(self)
+        if self.segments() > 1:
+            length = len(self.samples) // self.segments()
+
+            wave.samples = self.samples[idx*length:(idx+1)*length]
+            wave.waveArrayCount = length
+            wave.horizOffset = self.trigTimes[idx, 1]
+
+        wave.segmentIndex = idx
+        wave.segmentTime = self.trigTimes[idx, 0] if len(self.trigTimes) > idx else 0.0
+        wave._x = None
+        wave._y = None
+
+        return wave
+
+    @property
+    def x(self):
+        if self._x is None:
+            self._x = self.timeOffset() + self.timeInterval()*np.arange(len(self.samples))
+        return self._x
+
+    @x.setter
+    def x(self, value):
+        self._x = value
+
+    @property
+    def y(self):
+        if self._y is None:
+            self._y = self.verticalGain*self.samples.astype(np.float64) - self.verticalOffset
+        return self._y
+
+    @y.setter
+    def y(self, value):
+        self._y = value
+
+
+    def build(samples, gain, offset, interval, horiz_offset, source=1, instrument='LECROYWR8104',
+            first_point=0, sparsing=1, timestamp=None, segments=1, trigger_interval=1e-3):
+        """Creates a byte-stream equivalent to the scope response to `WF?` (resp. a .trc file).
+
+        With segments > 1, the samples are the concatenated segments of a sequence acquisition.
+        Used to produce test and benchmark data."""
+
+        samples = np.asarray(samples, dtype='<i2')
+        if timestamp is None:
+            timestamp = time.localtime()
+
+        trigtimes = np.zeros((segments, 2), dtype='<f8') if segments > 1 else np.zeros((0, 2), dtype='<f8')
+        if segments > 1:
+            trigtimes[:, 0] = trigger_interval*np.arange(segments)
+            trigtimes[:, 1] = horiz_offset
+
+        desc = bytearray(WaveDesc.LENGTH)
+        values = {
+            'descriptorName': WaveDesc.NAME,
+            'templateName': WaveDesc.TEMPLATE.encode(),
+            'commType': 1,
+            'commOrder': 1,
+            'waveDescriptor': WaveDesc.LENGTH,
+            'userText': 0,
+            'trigTimeArray': trigtimes.nbytes,
+            'risTimeArray': 0,
+            'waveArray1': samples.nbytes,
+            'instrumentName': instrument.encode(),
+            'instrumentNumber': 1,
+            'traceLabel': b'',
+            'waveArrayCount': len(samples),
+            'pointsPerScreen': len(samples) // segments,
+            'firstValidPoint': 0,
+            'lastValidPoint': len(samples)-1,
+            'firstPoint': first_point,
+            'sparsingFactor': sparsing,
+            'segmentIndex': 0,
+            'subarrayCount': segments,
+            'sweepsPerAcq': 1,
+            'verticalGain': gain,
+            'verticalOffset': offset,
+            'maxValue': 32512,
+            'minValue': -32768,
+            'nominalBits': 8,
+            'horizInterval': interval,
+            'horizOffset': horiz_offset,
+            'acqDuration': 0,
+            'recordTypeID': 0,
+            'processingDoneID': 0,
+            'timeBaseID': 100,
+            'verticalCouplingID': 0,
+            'probeAttenuation': 1,
+            'bandwidthLimitID': 0,
+            'waveSourceID': source,
+        }
+        for name, (pos, format) in WaveDesc.FIELDS.items():
+            struct.pack_into('<' + format, desc, pos, values[name])
+
+        struct.pack_into('<dBBBBh', desc, WaveDesc.TRIGGER_TIME, float(timestamp.tm_sec),
+            timestamp.tm_min, timestamp.tm_hour, timestamp.tm_mday, timestamp.tm_mon, timestamp.tm_year)
+
+        block = bytes(desc) + trigtimes.tobytes() + samples.tobytes()
+        return f'#9{len(block):09d}'.encode() + block
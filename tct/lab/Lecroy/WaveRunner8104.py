@@ -47,6 +47,18 @@ class WaveRunner8104(InterfaceVXI11):
         C3 = 'C3'
         C4 = 'C4'
 
+    class MEMORY:
+        all = ['M1', 'M2', 'M3', 'M4']
+        M1 = 'M1'
+        M2 = 'M2'
+        M3 = 'M3'
+        M4 = 'M4'
+
+    class SAMPLE_MODE:
+        all = ['RealTime', 'Sequence']
+        REALTIME = 'RealTime'
+        SEQUENCE = 'Sequence'
+
     class TRIGGER_MODE:
         STOP = 'stopped'
         NORMAL = 'normal'
@@ -75,14 +87,69 @@ class WaveRunner8104(InterfaceVXI11):
             self.log.error(f'Header of [WF?] command is not correct. Expected [WF] - Received [{data[0:2]}]')
             return None
 
-        return data[3:]
+        # Do not copy the (potentially large) waveform data
+        return memoryview(data)[3:]
+
+    def Waveforms(self, channels):
+        # The waveforms of several channels with a single query, the responses are concatenated
+        data = self.query(';'.join([f'{channel}:WF? WF' for channel in channels]), resp=True, raw=True)
+
+        blocks = []
+        pos = 0
+        for channel in channels:
+            # Each response contains a definite length block: #9<length><data>
+            start = data.find(b'#9', pos)
+            if start < 0:
+                self.log.error(f'Response of [WF?] does not contain the waveform of [{channel}]!')
+                return None
+
+            length = int(data[start+2:start+11])
+            blocks.append(memoryview(data)[start:start+11+length])
+            pos = start + 11 + length
+
+        return blocks
+
+    def Store(self, source, memory):
+        # Copies the trace of the source (e.g. the averaged channel) to an internal memory
+        if memory not in self.MEMORY.all:
+            return False
+        return self.query(f'STORE {source},{memory}')
+
+    def WaveformSetup(self, first=0, points=0, sparsing=1, segment=0):
+        # Transfer window of `WF?`: every `sparsing`-th point, starting at `first`, at most `points` (0 = all)
+        return self.query(f'WAVEFORM_SETUP SP,{int(sparsing)},NP,{int(points)},FP,{int(first)},SN,{int(segment)}')
+
 
+    def _measureResult(value):
+        # Parameters without a valid result return a text (e.g. 'No Data')
+        try:
+            return float(value)
+        except ValueError:
+            return float('nan')
 
     def MeasureValue(self, msr):
-        if msr not in self.MEASURE.values():
+        if msr not in self.MEASURE.all:
+            return None
+
+        return WaveRunner8104._measureResult(self._vbsQuery('app.measure.%s.out.result.value'%(msr)))
+
+    def MeasureValues(self, msrs):
+        # The results of several parameters in a single query
+        if any(msr not in self.MEASURE.all for msr in msrs):
             return None
 
-        return float(self._vbsQuery('app.measure.%s.out.result.value'%(msr)))
+        reply = self._vbsQuery(' & "," & '.join(['app.measure.%s.out.result.value'%(msr) for msr in msrs]))
+        return [WaveRunner8104._measureResult(value) for value in reply.strip().split(',')]
+
+    def SetMeasure(self, msr, param, source):
+        # param: Name of the parameter engine, e.g. 'Maximum', 'Area' or 'Rise'
+        if msr not in self.MEASURE.all:
+            return False
+
+        self._vbsCMD(f'app.Measure.ShowMeasure = true')
+        self._vbsCMD(f'app.Measure.{msr}.ParamEngine = "{param}"')
+        self._vbsCMD(f'app.Measure.{msr}.Source1 = "{source}"')
+        return self._vbsCMD(f'app.Measure.{msr}.View = true')
 
 
     ## Channel Setup
@@ -111,15 +178,36 @@ class WaveRunner8104(InterfaceVXI11):
 
     ## Handle channel sweeps
     def ClearSweeps(self, channel):
-        return self._vbsCMD(f'app.Acquisition.{channel}.ClearSweeps')
+        # A list of channels is cleared with a single command
+        channels = channel if isinstance(channel, list) else [channel]
+        return self._vbsCMD(' : '.join([f'app.Acquisition.{ch}.ClearSweeps' for ch in channels]))
 
     def GetSweeps(self, channel):
         return int(self._vbsQuery(f'app.Acquisition.{channel}.Out.Result.Sweeps'))
 
 
+    ## Sequence (segmented memory) acquisition
+    def SampleMode(self, mode):
+        if mode not in self.SAMPLE_MODE.all:
+            return False
+        return self._vbsCMD(f'app.Acquisition.Horizontal.SampleMode = "{mode}"')
+
+    def GetSampleMode(self):
+        return self._vbsQuery('app.Acquisition.Horizontal.SampleMode').strip()
+
+    def NumSegments(self, num):
+        if num < 1:
+            return False
+        return self._vbsCMD(f'app.Acquisition.Horizontal.NumSegments = {int(num)}')
+
+    def GetNumSegments(self):
+        return int(self._vbsQuery('app.Acquisition.Horizontal.NumSegments'))
+
+
     ## Handle Trigger
     def WaitUntilIdle(self, timeout):
-        return bool(self._vbsQuery(f'app.WaitUntilIdle({timeout})'))
+        # VBS returns the boolean as string: True = '-1' / False = '0'
+        return self._vbsQuery(f'app.WaitUntilIdle({timeout})').strip() not in ['0', 'False', '']
 
     def Acquire(self, timeout):
         try:
@@ -1 +1,2 @@
 from .WaveRunner8104 import WaveRunner8104
+from .WaveDesc import WaveDesc
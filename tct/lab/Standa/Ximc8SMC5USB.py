@@ -1,6 +1,11 @@
 import ctypes
 
-from . import pyximc
+from ..emulator import Emulator
+
+if Emulator.enabled():
+    from ..emulator import pyximc
+else:
+    from . import pyximc
 
 class Ximc8SMC5USB():
 
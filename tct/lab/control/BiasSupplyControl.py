@@ -1,4 +1,6 @@
 from ..Keithley import SMU2410
+from .StateCache import StateCache
+from ...logger import Timing
 
 import time
 import numpy as np
@@ -7,9 +9,11 @@ class BiasSupplyControl():
 
     VOLTAGE_RAMP = 20 # V / s
 
-    def __init__(self, port='/dev/ttyUSB0', log=None, VLimit=1000, ILimit=0.02):
+    def __init__(self, port='/dev/ttyUSB0', log=None, VLimit=1000, ILimit=0.02, cache=None, timing=None):
         self.smu = SMU2410(port, log=log)
         self._log = log
+        self._cache = StateCache(enabled=False) if cache is None else cache
+        self._timing = Timing(enabled=False) if timing is None else timing
 
         self.voltage_limit = VLimit
 
@@ -49,26 +53,29 @@ class BiasSupplyControl():
             - Sense Mode
         """
 
-        if self.smu.sourceMode() != SMU2410.SOURCE_MODE.VOLTAGE:
+        # All settings are read in a single round trip
+        config = self.smu.configuration()
+
+        if config['sourceMode'] != SMU2410.SOURCE_MODE.VOLTAGE:
             self.log("Bias-SMU", "Source mode is not correct!")
             return False
-        if self.smu.sourceVoltageMode() != SMU2410.SOURCE_MODE.FIXED:
+        if config['sourceVoltageMode'] != SMU2410.SOURCE_MODE.FIXED:
             self.log("Bias-SMU", "Source voltage mode is not correct!")
             return False
 
-        if self.smu.currentProtection() != self.current_limit:
+        if config['currentProtection'] != self.current_limit:
             self.log("Bias-SMU", "Current compliance is not correct!")
             return False
 
-        if self.smu.voltageSourceRange() != self.voltage_range:
+        if config['voltageSourceRange'] != self.voltage_range:
             self.log("Bias-SMU", "Voltage source range is not correct!")
             return False
 
-        if self.smu.currentSenseRange() != self.current_range:
+        if config['currentSenseRange'] != self.current_range:
             self.log("Bias-SMU", "Current sense range is not correct!")
             return False
 
-        if not self.smu.currentSense():
+        if not config['currentSense']:
             self.log("Bias-SMU", "SMU is not in current sense mode!")
             return False
 
@@ -81,15 +88,8 @@ class BiasSupplyControl():
         self.SMUOff()
         self.smu.setVoltage(0)
 
-        self.smu.setSourceMode(SMU2410.SOURCE_MODE.VOLTAGE)
-        self.smu.setSourceVoltageMode(SMU2410.SOURCE_MODE.FIXED)
-
-        self.smu.setCurrentProtection(self.current_limit)
-        self.smu.setVoltageSourceRange(self.voltage_range)
-
-        self.smu.setCurrentSenseRange(self.current_range)
-
-        self.smu.enableCurrentSense()
+        self.smu.configure(SMU2410.SOURCE_MODE.VOLTAGE, SMU2410.SOURCE_MODE.FIXED,
+            self.current_limit, self.voltage_range, self.current_range, current_sense=True)
 
         self.log("Bias-SMU", f"Configured SMU: ({self.voltage_range} Voltage Range -- {self.current_limit} Current Compliance)")
 
@@ -97,13 +97,14 @@ class BiasSupplyControl():
         state['bias.hv'] = self.SMUVoltage()
         state['bias.state'] = self.SMUState()
 
-        state['bias.current'] = self.SMUCurrent()
+        state['bias.current'] = self._cache.get('bias.current', self.SMUCurrent, measured=True)
 
         return state
 
     def FromState(self, state):
         if 'bias.hv' in state:
-            self.SMURampVoltage(float(state['bias.hv']))
+            with self._timing.measure('ramp'):
+                self.SMURampVoltage(float(state['bias.hv']))
         if 'bias.state' in state:
             if state['bias.state']:
                 self.SMUOn()
@@ -118,6 +119,7 @@ class BiasSupplyControl():
             self.log("Bias-SMU", f"Error: Set voltage [{voltage:.2f}V] out of range [0V, {self.voltage_limit:.2f}V]")
             return False
 
+        # The ramp always starts from the actual instrument state (not the cache)
         if not self.smu.state():
             if voltage != self.smu.voltage():
                 self.smu.setVoltage(voltage)
@@ -147,14 +149,23 @@ class BiasSupplyControl():
 
                 self.log("Bias-SMU", "Ramp bias to %fV."%(voltage))
 
+        self._cache.set('bias.hv', voltage)
         return True
 
+    def SMUCurrentBuffered(self, count, delay=0.1):
+        # Multiple current measurements at the present voltage, read from the SMU buffer at once
+        if not self.SMUState():
+            return None
+
+        return self.smu.measureCurrentBuffered(count, delay)
+
     def SMUOn(self):
         if not self.smu.state():
             voltage = self.smu.voltage()
             self.smu.setVoltage(0)
 
             self.smu.on()
+            self._cache.set('bias.state', True)
             self.log("Bias-SMU", "Turn SMU on.")
 
             # Ramp voltage up to set value
@@ -170,6 +181,7 @@ class BiasSupplyControl():
             self.SMURampVoltage(0)
 
             self.smu.off()
+            self._cache.set('bias.state', False)
             self.log("Bias-SMU", "Turn SMU off.")
 
             return True
@@ -179,17 +191,14 @@ class BiasSupplyControl():
             return True
 
     def SMUState(self):
-        return self.smu.state()
+        return self._cache.get('bias.state', self.smu.state)
 
     def SMUVoltage(self):
-        return self.smu.voltage()
+        return self._cache.get('bias.hv', self.smu.voltage)
 
     def SMUCurrent(self):
-        if not self.smu.state():
+        if not self.SMUState():
             return None
 
         # Trigger one current measurement
-        self.smu.setArmCount(1)
-        self.smu.init()
-
-        return self.smu.readCurrent()
+        return self.smu.measureCurrent()
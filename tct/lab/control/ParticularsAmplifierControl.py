@@ -1,4 +1,5 @@
 from ..TTi import PLH250P
+from .StateCache import StateCache
 
 import numpy as np
 
@@ -25,9 +26,10 @@ class ParticularsAmplifierControl():
         [12.002680965147452,    1.],
     ])
 
-    def __init__(self, ip="10.10.0.10", port=9221, log=None):
+    def __init__(self, ip="10.10.0.10", port=9221, log=None, cache=None):
         self.plh = PLH250P(ip, port, log=log)
         self._log = log
+        self._cache = StateCache(enabled=False) if cache is None else cache
 
         if not self.check():
             self.setup()
@@ -77,7 +79,7 @@ class ParticularsAmplifierControl():
         state['amp.state'] = self.AmpState()
 
         state['amp.voltage'] = self.AmpVoltage()
-        state['amp.current'] = self.AmpCurrent()
+        state['amp.current'] = self._cache.get('amp.current', self.AmpCurrent, measured=True)
 
         return state
 
@@ -107,21 +109,24 @@ class ParticularsAmplifierControl():
             return False
 
         self.plh.setVoltage(voltage)
+        self._cache.set('amp.voltage', voltage)
         self.log("Amp-PSU", "Set amplifier supply to %fV"%(voltage))
 
     def AmpOn(self):
         self.plh.on()
+        self._cache.set('amp.state', True)
         self.log("Amp-PSU", "Turn amplifier on")
 
     def AmpOff(self):
         self.plh.off()
+        self._cache.set('amp.state', False)
         self.log("Amp-PSU", "Turn amplifier off")
 
     def AmpState(self):
-        return self.plh.state()
+        return self._cache.get('amp.state', self.plh.state)
 
     def AmpVoltage(self):
-        return self.plh.voltage()
+        return self._cache.get('amp.voltage', self.plh.voltage)
 
 
     def AmpGet(self):
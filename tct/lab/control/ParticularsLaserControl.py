@@ -1,10 +1,12 @@
 from ..Particulars import LaserLA01
+from .StateCache import StateCache
 
 class ParticularsLaserControl():
 
-    def __init__(self, frequency=None, dac=None, log=None):
+    def __init__(self, frequency=None, dac=None, log=None, cache=None):
         self.laser = LaserLA01(log=log)
         self._log = log
+        self._cache = StateCache(enabled=False) if cache is None else cache
 
         # We can not check for correct settings as the laser does not give feedback.
         # Always setup to defaults
@@ -54,16 +56,19 @@ class ParticularsLaserControl():
 
     def LaserOn(self):
         if self.laser.on():
+            self._cache.set('laser.state', True)
             self.log("Laser", f"Turned the laser on.")
         else:
+            self._cache.invalidate('laser.state')
             self.log("Laser", f"WARNING: Laser could not be turned on!")
 
     def LaserOff(self):
         self.laser.off()
+        self._cache.set('laser.state', False)
         self.log("Laser", f"Turned the laser off.")
 
     def LaserState(self):
-        return self.laser.state()
+        return self._cache.get('laser.state', self.laser.state)
 
 
     def LaserSetFrequency(self, frequency):
@@ -72,7 +77,8 @@ class ParticularsLaserControl():
             return False
 
         self.laser.setFrequency(frequency)
-        if self.laser.state():
+        self._cache.set('laser.frequency', frequency)
+        if self.LaserState():
             self.laser.on()
 
         self.log("Laser", f"Set the laser frequency to {frequency/1000:0.0f}kHz.")
@@ -83,11 +89,12 @@ class ParticularsLaserControl():
             self.log("Laser", f"Error: DAC [{int(dac)}] not in [0, 1024[!")
             return False
 
-        state = self.laser.state()
+        state = self.LaserState()
 
         self.laser.off()
         self.laser.enableDAC()
         self.laser.setDAC(int(dac))
+        self._cache.set('laser.dac', int(dac))
 
         if state:
             self.laser.on()
@@ -95,7 +102,7 @@ class ParticularsLaserControl():
         self.log("Laser", f"Set the laser DAC to {int(dac)}.")
 
     def LaserGetFrequency(self):
-        return self.laser.frequency()
+        return self._cache.get('laser.frequency', self.laser.frequency)
 
     def LaserGetDAC(self):
-        return self.laser.DAC()
+        return self._cache.get('laser.dac', self.laser.DAC)
@@ -1,12 +1,71 @@
-import lecroyparser
+import threading
 import time
 
 import numpy as np
 
-from ..Lecroy import WaveRunner8104
+from ..Lecroy import WaveRunner8104, WaveDesc
+from .StateCache import StateCache
+from ...logger import Timing
+from ...data.FigureOfMerit import FigureOfMerit
 
 class ScopeControl():
 
+    class Buffer():
+        """Handle of an averaged trace stored in an internal memory of the scope (see `AcquireBuffered`).
+
+        The trace can be read from a different thread, while the scope already acquires the next entry."""
+
+        # Time to wait for the previous trace of a memory to be read, before overwriting it (in s)
+        TIMEOUT = 60
+
+        def __init__(self, control, memory):
+            self.control = control
+            self.memory = memory
+
+            self._read = threading.Event()
+
+        def done(self):
+            return self._read.is_set()
+
+        def wait(self, timeout=TIMEOUT):
+            return self._read.wait(timeout)
+
+        def discard(self):
+            # The trace is not needed (e.g. clipped and acquired again), the memory can be overwritten
+            self._read.set()
+
+        def read(self, parse=True):
+            try:
+                with self.control._timing.measure('transfer'):
+                    raw = self.control.scope.Waveform(self.memory)
+            finally:
+                self._read.set()
+
+            if not parse:
+                return raw
+            return self.control.ParseWaveform(raw)
+
+    # Limits of the wait between two sweep count queries during averaging (in s)
+    SWEEP_WAIT_MIN = 0.01
+    SWEEP_WAIT_MAX = 2.0
+
+    # Features which can be measured by the scope (column name: parameter engine).
+    # The scope evaluates the full record without a baseline subtraction, they are therefore
+    # not equivalent to the functions of the analysis (`max()`, `min()`, `integral()`).
+    FEATURES = {
+        'scope.measure.max': 'Maximum',
+        'scope.measure.min': 'Minimum',
+        'scope.measure.integral': 'Area',
+        'scope.measure.amplitude': 'Amplitude',
+        'scope.measure.risetime': 'Rise',
+        'scope.measure.falltime': 'Fall',
+    }
+
+    # Vertical range relative to the extent of the signal, when scaling automatically
+    SCALE_MARGIN = 1.5
+    # A measured extent within this fraction of the vertical range from its limits is clipped
+    CLIP_MARGIN = 0.005
+
     def WaveToMetadata(self, wave):
 
         metadata = {
@@ -18,6 +77,8 @@ class ScopeControl():
             'nominalBits': wave.nominalBits,
             'horizInterval': wave.horizInterval,
             'horizOffset': wave.horizOffset,
+            'firstPoint': wave.firstPoint,
+            'sparsingFactor': wave.sparsingFactor,
             'triggerTime': wave.triggerTime,
             'recordType': wave.recordType,
             'processingDone': wave.processingDone,
@@ -27,13 +88,48 @@ class ScopeControl():
             'waveSource': wave.waveSource,
         }
 
+        if wave.subarrayCount > 1:
+            metadata['segment'] = wave.segmentIndex
+            metadata['segmentTime'] = wave.segmentTime
+
         return metadata
 
-    def __init__(self, setup=True, log=None):
+    def WaveToRaw(self, wave):
+        # The scope sends 16bit ADC codes, which are scaled as: y = gain*code - offset
+        # The time axis is fully defined by the horizontal interval and offset.
+        codes = wave.samples.astype(np.int16, copy=False)
+
+        return codes, wave.verticalGain, wave.verticalOffset, wave.timeInterval(), wave.timeOffset()
+
+    def __init__(self, setup=True, log=None, cache=None, timing=None):
         self.scope = WaveRunner8104("10.10.0.11", log=log)
         self._log = log
+        self._cache = StateCache(enabled=False) if cache is None else cache
+        self._timing = Timing(enabled=False) if timing is None else timing
 
+        # The first channel is used for the averaging, scaling and measurements
         self.CH = WaveRunner8104.CHANNEL.C2
+        self.channels = [self.CH]
+        self._segments = 1
+
+        # Expected trigger rate (e.g. laser frequency) and the sweep rate observed during averaging
+        self._triggerRate = None
+        self._sweepRate = None
+
+        # Number of sweeps of the last averaged acquisition
+        self._sweeps = None
+
+        # Features measured by the scope (P1, P2, ...), including the extent for the clipping
+        self._features = []
+        self._measured = []
+
+        # Traces waiting to be read from the internal memories (see `AcquireBuffered`)
+        self._buffers = {}
+        self._memory = 0
+
+        # Extent (min, max) and clipping of the last acquired waveform
+        self._extent = None
+        self._clipped = None
 
         self.scope.COMMHeader(on=False)
         self.scope.COMMFormat(['off', 'word', 'bin'])
@@ -62,12 +158,17 @@ class ScopeControl():
         # TODO properly implement
 
         # TODO this should call a higher order function in ScopeControl
-        state['scope.average'] = self.scope.GetAverage(self.CH)
+        state['scope.average'] = self.GetAverage()
 
         # TODO implement
         # state['scope.time'] = self.GetHorRange()
 
-        state['scope.amplitude'] = self.GetVertRange()
+        state['scope.amplitude'] = self._cache.get('scope.amplitude', self.GetVertRange)
+
+        if self._sweeps is not None:
+            state['scope.sweeps'] = self._sweeps
+        if self._clipped is not None:
+            state['scope.clipped'] = self._clipped
 
         return state
 
@@ -94,27 +195,108 @@ class ScopeControl():
         # TODO
         pass
 
+    def GetAverage(self):
+        return self._cache.get('scope.average', lambda: self.scope.GetAverage(self.CH))
+
     def SetAverage(self, navg):
-        if self.scope.GetAverage(self.CH) != navg and navg > 0:
+        if self.GetAverage() != navg and navg > 0:
             self.log('Scope', f'Set Average to [{navg}].')
-            self.scope.Average(self.CH, navg)
+            for channel in self.channels:
+                self.scope.Average(channel, navg)
+            self._cache.set('scope.average', navg)
+
+    def SetTriggerRate(self, rate):
+        # Used to predict the duration of the averaging
+        if rate != self._triggerRate:
+            self._triggerRate = rate
+            self._sweepRate = None
+
+    def SetSequence(self, segments):
+        # With segments > 1 each acquisition captures this number of triggers into the scope memory
+        segments = max(1, int(segments))
+        if segments > 1:
+            self.log('Scope', f'Enable sequence mode with [{segments}] segments.')
+            self.scope.SampleMode(WaveRunner8104.SAMPLE_MODE.SEQUENCE)
+            self.scope.NumSegments(segments)
+        elif self._segments > 1:
+            self.log('Scope', 'Disable sequence mode.')
+            self.scope.SampleMode(WaveRunner8104.SAMPLE_MODE.REALTIME)
+
+        self._segments = segments
+
+    def SetTransferWindow(self, first=0, points=0, sparsing=1):
+        # Only this window of the record is transferred, the time axis is corrected via `WaveDesc.timeOffset`
+        if first < 0 or points < 0 or sparsing < 1:
+            raise Exception(f'Invalid transfer window: first [{first}], points [{points}], sparsing [{sparsing}]!')
+
+        if points > 0 or first > 0 or sparsing > 1:
+            self.log('Scope', f'Transfer {points if points > 0 else "all"} points from point {first} with sparsing {sparsing}.')
+        self.scope.WaveformSetup(first, points, sparsing)
 
     # TODO Implement auto scale of Y-Axis
 
-    def _readWaveform(self):
-        # The data sent by the scope (in binary) mode, is equivalent to a .trc file.
-        # Use LecroParser for interpreting the byte-stream.
-        # The TEMPLATE of the sent data packate can be retrieved via the `TMPL?` command.
-        # See also Page 6-22 here: https://cdn.teledynelecroy.com/files/manuals/maui-remote-control-and-automation-manual.pdf
-        raw = self.scope.Waveform(self.CH)
-        return lecroyparser.ScopeData(data=raw)
+    def SetChannels(self, channels):
+        # All channels are transferred per acquisition, as separate waveforms (see `SplitChannels`)
+        if len(channels) < 1 or any(channel not in WaveRunner8104.CHANNEL.all for channel in channels):
+            raise Exception(f'Invalid scope channels {channels}! Valid: {WaveRunner8104.CHANNEL.all}')
 
+        self.log('Scope', f'Acquire channels {channels}.')
+        self._cache.invalidate('scope')
+
+        self.CH = channels[0]
+        self.channels = list(channels)
+
+        # All channels average the same number of sweeps
+        num_average = self.scope.GetAverage(self.CH)
+        for channel in self.channels[1:]:
+            self.scope.Average(channel, num_average)
+
+    def _readWaveform(self, parse=True, primary=False):
+        # The data sent by the scope (in binary) mode, is equivalent to a .trc file.
+        # It is interpreted by `WaveDesc`, see there for the format description.
+        # With several channels, the raw data is a list with one entry per channel.
+        with self._timing.measure('transfer'):
+            if len(self.channels) > 1 and not primary:
+                raw = self.scope.Waveforms(self.channels)
+            else:
+                raw = self.scope.Waveform(self.CH)
+
+        # Only the descriptor is parsed here, the samples are a view on the raw data
+        wave = self.ParseWaveform(raw)
+        self._extent = wave.extent()
+        self._clipped = wave.clipped()
+        if self._clipped:
+            self.log('Scope', 'WARNING: The waveform is clipped at the limits of the vertical range!')
+
+        if not parse:
+            return raw
+
+        return wave
+
+    def ParseWaveform(self, raw):
+        # Does not access the scope, can therefore be called from a different thread.
+        # Only the first channel is parsed, see `SplitChannels` for all channels.
+        if isinstance(raw, list):
+            raw = raw[0]
+        return WaveDesc(raw)
+
+    def SplitChannels(self, raw):
+        # Raw data per channel (only a single one, if only one channel is acquired)
+        return raw if isinstance(raw, list) else [raw]
+
+    def SplitWaveform(self, wave):
+        # One waveform per segment (only a single one, if not acquired in sequence mode)
+        return [wave.segment(nn) for nn in range(wave.segments())]
+
+
+    def _vertRange(self, scale, offset):
+        return (-0.5*self.scope.N_DIV*scale - offset, 0.5*self.scope.N_DIV*scale - offset)
 
     def GetVertRange(self):
         scale = self.scope.GetVerScale(self.CH)
         offset = self.scope.GetVerOffset(self.CH)
 
-        return (-0.5*self.scope.N_DIV*scale - offset, 0.5*self.scope.N_DIV*scale - offset)
+        return self._vertRange(scale, offset)
 
     def SetVertRange(self, range):
         self.log('Scope', f'Require vertical range of {range}.')
@@ -125,6 +307,7 @@ class ScopeControl():
         self.log('Scope', f'Set vertical axis to {scale} V/div + {offset} V.')
         self.scope.VerScale(self.CH, scale)
         self.scope.VerOffset(self.CH, offset)
+        self._cache.set('scope.amplitude', self._vertRange(scale, offset))
 
 
     def AutoScale(self):
@@ -133,7 +316,7 @@ class ScopeControl():
         ## Alternative (slower) implementation via the built in FindScale function
         # num_average = self.scope.GetAverage(self.CH)
         # self.scope.Average(self.CH, 1)
-        # self.scope.ClearSweeps(self.CH)
+        # self.scope.ClearSweeps(self.channels)
         # self.scope.WaitUntilIdle(1)
         #
         # self.scope.FindScale(self.CH)
@@ -144,61 +327,249 @@ class ScopeControl():
 
         # Set initial scale: -2.5V / 2.5V
         # This should fit any TCT signal, as the amplifier limits before that.
+        self._cache.invalidate('scope.amplitude')
         self.scope.VerOffset(self.CH, 0)
         self.scope.VerScale(self.CH, 0.5)
 
         # Get a single (non averaged trigger)
-        num_average = self.scope.GetAverage(self.CH)
+        num_average = self.GetAverage()
         self.scope.TriggerMode(WaveRunner8104.TRIGGER_MODE.STOP)
         self.scope.Average(self.CH, 1)
-        self.scope.ClearSweeps(self.CH)
+        self.scope.ClearSweeps(self.channels)
         self.scope.WaitUntilIdle(1)
 
-        while True:
-            if self.scope.Acquire(10):
-                break
+        with self._timing.measure('trigger'):
+            while True:
+                if self.scope.Acquire(10):
+                    break
 
         # Set range based on acquired waveform
-        wave = self._readWaveform()
-        range = (np.min(wave.y)*1.5, np.max(wave.y)*1.5)
-
-        self.SetVertRange(range)
+        wave = self._readWaveform(primary=True)
+        self.SetVertRange(self._scaleRange(wave.extent()))
 
         self.scope.Average(self.CH, num_average)
+        self._cache.set('scope.average', num_average)
         self.scope.TriggerMode(WaveRunner8104.TRIGGER_MODE.NORMAL)
 
-    def AcquireAverage(self):
+    def _scaleRange(self, extent):
+        return (extent[0]*self.SCALE_MARGIN, extent[1]*self.SCALE_MARGIN)
+
+    def PredictScale(self):
+        # Sets the vertical range from the extent of the previous waveform, avoiding the acquisition of `AutoScale`.
+        # Falls back to `AutoScale` if there is no previous waveform or it was clipped.
+        if self._extent is None or self._clipped:
+            return self.AutoScale()
+
+        self.log('Scope', 'Predict vertical scale from the previous waveform.')
+        self.SetVertRange(self._scaleRange(self._extent))
+
+    def IsClipped(self):
+        # Whether the last acquired waveform is clipped
+        return bool(self._clipped)
+
+    def _average(self):
         # Clear the previous sweeps
         self.scope.TriggerMode(WaveRunner8104.TRIGGER_MODE.STOP)
-        self.scope.ClearSweeps(self.CH)
+        self.scope.ClearSweeps(self.channels)
         self.scope.WaitUntilIdle(1)
 
-        num_average = self.scope.GetAverage(self.CH)
+        num_average = self.GetAverage()
 
         self.log('Scope', 'Waiting for initial trigger.')
-        while True:
-            if self.scope.Acquire(10):
-                break
-            self.log('Scope', 'Still waiting for a trigger.')
+        with self._timing.measure('trigger'):
+            while True:
+                if self.scope.Acquire(10):
+                    break
+                self.log('Scope', 'Still waiting for a trigger.')
 
         if num_average > 1:
             self.scope.TriggerMode(WaveRunner8104.TRIGGER_MODE.NORMAL)
 
             self.log('Scope', f'Waiting for {num_average} sweeps.')
+            with self._timing.measure('average'):
+                self._waitForSweeps(num_average)
+
+        self._sweeps = num_average
+
+    def AcquireAverage(self, parse=True):
+        # With parse=False the raw byte-stream is returned, to be parsed later via `ParseWaveform`.
+        self._average()
+        return self._readWaveform(parse)
+
+    def AcquireBuffered(self):
+        # Averaged acquisition, the trace is stored to the next internal memory (M1 ... M4) instead of being transferred.
+        # Returns a `Buffer`, its waveform can be read while the setup moves on and the scope acquires the next entry.
+        # The extent and clipping are measured by the scope right away, they do not depend on the read of the trace.
+        if 'scope.measure.max' not in self._measured:
+            raise Exception('Buffered acquisition needs the max/min measurements, see `SetFeatures`!')
+
+        self._average()
+        self._readMeasurements()
+
+        memory = WaveRunner8104.MEMORY.all[self._memory]
+        self._memory = (self._memory + 1) % len(WaveRunner8104.MEMORY.all)
+
+        # The memory must not be overwritten before its previous trace was read
+        previous = self._buffers.get(memory)
+        if previous is not None and not previous.wait():
+            self.log('Scope', f'WARNING: Trace in [{memory}] was not read, overwriting it!')
 
-            while 1:
-                sweeps = self.scope.GetSweeps(self.CH)
-                if sweeps >= num_average:
+        self.scope.Store(self.CH, memory)
+        self.scope.WaitUntilIdle(1)
+
+        buffer = ScopeControl.Buffer(self, memory)
+        self._buffers[memory] = buffer
+        return buffer
+
+    def SetFeatures(self, features):
+        # Configures the scope measurements P1, P2, ... for the given features, e.g. ['scope.measure.max', 'scope.measure.integral'].
+        # The maximum and minimum are always measured, the clipping and scale prediction depend on them.
+        measured = list(features) + [feature for feature in ['scope.measure.max', 'scope.measure.min'] if feature not in features]
+        if len(measured) > len(WaveRunner8104.MEASURE.all):
+            raise Exception(f'The scope can measure at most {len(WaveRunner8104.MEASURE.all)} features, including max and min!')
+
+        for msr, feature in zip(WaveRunner8104.MEASURE.all, measured):
+            if feature not in self.FEATURES:
+                raise Exception(f'Feature [{feature}] can not be measured by the scope! Valid: {list(self.FEATURES)}')
+
+            self.log('Scope', f'Measure [{feature}] as {msr.upper()}.')
+            self.scope.SetMeasure(msr, self.FEATURES[feature], self.CH)
+
+        self._features = list(features)
+        self._measured = measured
+
+    def AcquireFeatures(self):
+        # Averaged acquisition, only the results of the scope measurements are transferred.
+        # The waveform can be read afterwards via `ReadWaveform`, if needed.
+        self._average()
+
+        measured = self._readMeasurements()
+        return {feature: measured[feature] for feature in self._features}
+
+    def _readMeasurements(self):
+        # Results of the configured measurements (see `SetFeatures`)
+        values = self.scope.MeasureValues(WaveRunner8104.MEASURE.all[:len(self._measured)])
+        measured = dict(zip(self._measured, values))
+
+        # Extent for the scale prediction and clipping against the vertical range, unknown without a result
+        self._clipped = None
+        self._extent = None
+        if np.isfinite(measured['scope.measure.min']) and np.isfinite(measured['scope.measure.max']):
+            self._extent = (measured['scope.measure.min'], measured['scope.measure.max'])
+
+            low, high = self._cache.get('scope.amplitude', self.GetVertRange)
+            margin = self.CLIP_MARGIN*(high - low)
+            self._clipped = bool(self._extent[1] >= high - margin or self._extent[0] <= low + margin)
+            if self._clipped:
+                self.log('Scope', 'WARNING: The measured extent reaches the limits of the vertical range!')
+
+        return measured
+
+    def ReadWaveform(self, parse=True):
+        # Waveform of the last acquisition
+        return self._readWaveform(parse)
+
+    def AcquireAdaptive(self, fom, error, min_sweeps=16, parse=True):
+        """Averages until the relative error of the figure of merit (see `FigureOfMerit`) is below
+        `error`, but at most the set average number of sweeps.
+
+        The intermediate averaged waveform is read at increasing sweep counts. As the error
+        scales with 1/sqrt(sweeps), the next count is predicted from the current error."""
+
+        fom = FigureOfMerit(fom)
+
+        self.scope.TriggerMode(WaveRunner8104.TRIGGER_MODE.STOP)
+        self.scope.ClearSweeps(self.channels)
+        self.scope.WaitUntilIdle(1)
+
+        max_sweeps = self.GetAverage()
+
+        self.log('Scope', 'Waiting for initial trigger.')
+        with self._timing.measure('trigger'):
+            while True:
+                if self.scope.Acquire(10):
                     break
-                time.sleep(0.01)
+                self.log('Scope', 'Still waiting for a trigger.')
 
-        return self._readWaveform()
+        self.scope.TriggerMode(WaveRunner8104.TRIGGER_MODE.NORMAL)
 
-    def Acquire(self):
-        self.log('Scope', 'Waiting for a trigger.')
+        sweeps = 1
+        target = min(max(1, min_sweeps), max_sweeps)
         while True:
-            if self.scope.Acquire(10):
+            with self._timing.measure('average'):
+                sweeps = self._waitForSweeps(target, sweeps)
+            if sweeps >= max_sweeps:
+                break
+
+            wave = self._readWaveform(primary=True)
+            relative = fom.relativeError(wave.x, wave.y)
+            if relative <= error:
                 break
-            self.log('Scope', 'Still waiting for a trigger.')
 
-        return self._readWaveform()
+            # Predicted from the 1/sqrt(N) scaling, but at least a doubling if the signal is not yet visible
+            needed = sweeps*(relative/error)**2 if np.isfinite(relative) else 2*sweeps
+            target = int(min(max(needed*1.1, sweeps + 1), 4*sweeps, max_sweeps))
+
+        self.scope.TriggerMode(WaveRunner8104.TRIGGER_MODE.STOP)
+        self.scope.WaitUntilIdle(1)
+
+        self._sweeps = self.scope.GetSweeps(self.CH)
+        self.log('Scope', f'Stopped averaging after {self._sweeps} sweeps.')
+
+        return self._readWaveform(parse)
+
+    def _waitForSweeps(self, num_average, sweeps=1):
+        # Instead of polling the sweep count, the completion is predicted from the sweep rate
+        # and only confirmed by a query. The sweep rate observed in the previous averaging
+        # (including the scope dead time) is preferred over the trigger rate. Without any rate,
+        # the wait between queries is increased exponentially.
+        # Returns the number of acquired sweeps (at least `num_average`).
+        start = time.time()
+        initial = sweeps
+        rate = self._sweepRate if self._sweepRate is not None else self._triggerRate
+        wait = ScopeControl.SWEEP_WAIT_MIN
+
+        while sweeps < num_average:
+            if rate:
+                wait = (num_average - sweeps)/rate
+
+            time.sleep(min(max(wait, ScopeControl.SWEEP_WAIT_MIN), ScopeControl.SWEEP_WAIT_MAX))
+            sweeps = self.scope.GetSweeps(self.CH)
+
+            elapsed = time.time() - start
+            if sweeps > initial:
+                # The initial sweeps were acquired before the start
+                rate = (sweeps - initial)/elapsed
+            else:
+                rate = None
+                wait *= 2
+
+        if rate:
+            self._sweepRate = rate
+
+        return sweeps
+
+    def Acquire(self, parse=True):
+        self.log('Scope', 'Waiting for a trigger.')
+        with self._timing.measure('trigger'):
+            while True:
+                if self.scope.Acquire(10):
+                    break
+                self.log('Scope', 'Still waiting for a trigger.')
+
+        return self._readWaveform(parse)
+
+    def AcquireSequence(self, parse=True):
+        # Captures all segments in a single arm of the trigger and transfers them in one read.
+        # Use `SplitWaveform` to get the individual segments.
+        self.scope.TriggerMode(WaveRunner8104.TRIGGER_MODE.STOP)
+        self.scope.ClearSweeps(self.channels)
+        self.scope.WaitUntilIdle(1)
+
+        self.log('Scope', f'Waiting for {self._segments} triggers.')
+        self.scope.TriggerMode(WaveRunner8104.TRIGGER_MODE.SINGLE)
+        with self._timing.measure('trigger'):
+            while not self.scope.WaitUntilIdle(10):
+                self.log('Scope', 'Still waiting for the sequence to complete.')
+
+        return self._readWaveform(parse)
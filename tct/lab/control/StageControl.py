@@ -1,6 +1,8 @@
 import time
 
 from ..Standa import Ximc8SMC5USB
+from .StateCache import StateCache
+from ...logger import Timing
 
 class StageControl():
     """Controls the Particulars X-Y-Z Standa Stage
@@ -39,7 +41,7 @@ class StageControl():
         return steps*StageControl.MMPERSTEP
 
 
-    def __init__(self, serials={'x': 30086, 'y': 30084, 'z': 30031}, log=None, limits=None):
+    def __init__(self, serials={'x': 30086, 'y': 30084, 'z': 30031}, log=None, limits=None, cache=None, timing=None):
 
         self.stages = {ax: None for ax in StageControl.AXIS}
         for ax in StageControl.AXIS:
@@ -51,6 +53,8 @@ class StageControl():
             self.limits = limits
 
         self._log = log
+        self._cache = StateCache(enabled=False) if cache is None else cache
+        self._timing = Timing(enabled=False) if timing is None else timing
 
         self._valid = True
         self.check()
@@ -79,12 +83,11 @@ class StageControl():
 
 
     def ToState(self, state={}):
-        pos = self.Position()
-        for ax, value in pos.items():
-            state[StageControl.KEY_MAP[ax]] = value
-
+        # The position readback is part of the status, no separate query needed
         for ax, stage in self.stages.items():
-            status = stage.status()
+            status = self._cache.get(f'stage.status.{ax}', stage.status, measured=True)
+
+            state[StageControl.KEY_MAP[ax]] = StageControl.STEPS2MM(status['step'])
             for key, value in status.items():
                 state[f'stage.status.{ax}.{key}'] = value
 
@@ -95,7 +98,9 @@ class StageControl():
         for ax, key in StageControl.KEY_MAP.items():
             if key in state:
                 pos[ax] = float(state[key])
-        self.MoveTo(**pos)
+
+        with self._timing.measure('stage'):
+            self.MoveTo(**pos)
 
 
     def _moveTo(self, ax, pos, blocking=False, nolimit=False):
@@ -116,6 +121,7 @@ class StageControl():
 
     def DoHome(self):
         self.log('StageControl', f'Start home sequence.')
+        self._cache.invalidate('stage.status')
 
         for ax, stage in self.stages.items():
             stage.doHome(blocking=False)
@@ -158,6 +164,7 @@ class StageControl():
             targets['X'] = x
 
         ret = self._waitForStop()
+        self._cache.invalidate('stage.status')
 
         self._logMoveTo(targets)
         return ret
@@ -165,6 +172,7 @@ class StageControl():
     def FocusMoveTo(self, z):
         targets = {'Z': z}
         ret = self._moveTo('z', z, blocking=True)
+        self._cache.invalidate('stage.status')
 
         self._logMoveTo(targets)
         return ret
@@ -185,6 +193,7 @@ class StageControl():
             targets['Z'] = z
 
         ret = self._waitForStop()
+        self._cache.invalidate('stage.status')
 
         self._logMoveTo(targets)
         return ret
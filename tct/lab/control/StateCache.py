@@ -0,0 +1,56 @@
+import time
+
+class StateCache():
+    """Local copy of the instrument state, to avoid re-querying values over the slow links.
+
+    - Values set by the control classes are recorded and returned until invalidated.
+    - Measured values (currents, temperatures, stage readback) are queried again
+      once their refresh interval has passed (default: on every access).
+
+    The refresh interval (in s) can be configured per key or key prefix (e.g. `temp`
+    for all temperatures). It also applies to set values, to catch changes done
+    outside of this software (e.g. on the front panel)."""
+
+    def __init__(self, enabled=True, refresh=None):
+        self.enabled = enabled
+        self.refresh = {} if refresh is None else dict(refresh)
+
+        self._values = {}
+
+    def _interval(self, key, measured):
+        # Longest matching key prefix defines the interval
+        match = None
+        for prefix in self.refresh:
+            if key == prefix or key.startswith(prefix + '.'):
+                if match is None or len(prefix) > len(match):
+                    match = prefix
+
+        if match is not None:
+            return self.refresh[match]
+
+        return 0 if measured else None
+
+    def set(self, key, value):
+        if self.enabled:
+            self._values[key] = (value, time.time())
+
+        return value
+
+    def get(self, key, fct, measured=False):
+        if self.enabled and key in self._values:
+            value, stamp = self._values[key]
+
+            interval = self._interval(key, measured)
+            if interval is None or time.time() - stamp < interval:
+                return value
+
+        return self.set(key, fct())
+
+    def invalidate(self, key=None):
+        if key is None:
+            self._values = {}
+            return
+
+        for cached in list(self._values):
+            if cached == key or cached.startswith(key + '.'):
+                del self._values[cached]
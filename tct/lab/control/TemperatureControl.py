@@ -1,10 +1,12 @@
 from ..Temperature import PiController
+from .StateCache import StateCache
 
 class TemperatureControl():
 
-    def __init__(self, ip="10.10.0.20", port=5025, log=None):
+    def __init__(self, ip="10.10.0.20", port=5025, log=None, cache=None):
         self.pi = PiController(ip, port, log=log)
         self._log = log
+        self._cache = StateCache(enabled=False) if cache is None else cache
 
         # For now just temperature readout, so no checking necessary.
 
@@ -19,9 +21,9 @@ class TemperatureControl():
         pass
 
     def ToState(self, state={}):
-        state['temp.stage.temperature'] = self.StageTemperature()
-        state['temp.holder.temperature'] = self.HolderTemperature()
-        state['temp.holder.humidity'] = self.HolderHumidity()
+        state['temp.stage.temperature'] = self._cache.get('temp.stage.temperature', self.StageTemperature, measured=True)
+        state['temp.holder.temperature'] = self._cache.get('temp.holder.temperature', self.HolderTemperature, measured=True)
+        state['temp.holder.humidity'] = self._cache.get('temp.holder.humidity', self.HolderHumidity, measured=True)
 
         return state
 
@@ -1,3 +1,4 @@
+from .StateCache import StateCache
 from .ParticularsAmplifierControl import ParticularsAmplifierControl
 from .BiasSupplyControl import BiasSupplyControl
 from .ParticularsLaserControl import ParticularsLaserControl
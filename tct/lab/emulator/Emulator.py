@@ -0,0 +1,272 @@
+import copy
+import math
+import os
+import threading
+import time
+
+import numpy as np
+import yaml
+
+class Emulator():
+    """Emulated lab instruments, used instead of the hardware if the environment variable
+    `TCT_EMULATOR` is set (e.g. to run `util/scan.py` without a setup).
+
+    `TCT_EMULATOR=1` uses the `DEFAULTS`, otherwise it is the path of a yaml file overriding
+    some of them (e.g. the latencies). All instruments share the emulated physical state:
+    the bias (SMU), the amplifier supply, the laser and the stage positions, from which the
+    scope generates the TCT pulses.
+
+    - SMU 2410: SCPI on a pseudo terminal, opened by `InterfaceSerial` (see `SMUEmulator`)
+    - PLH250P and Pi controller: line based TCP servers on localhost (see `TCPEmulator`)
+    - WaveRunner 8104: in process stand-in for the `vxi11.Instrument` (see `ScopeEmulator`)
+    - Laser (USB HID) and stages (libximc): in process stand-ins (see `LaserEmulator`, `pyximc`)"""
+
+    ENV = 'TCT_EMULATOR'
+
+    DEFAULTS = {
+        # Delay of each command / reply (in s)
+        'latency': {
+            'serial': 0.005,
+            'tcp': 0.002,
+            'vxi11': 0.002,
+            'usb': 0.001,
+            'ximc': 0.0005,
+        },
+        # Serial baud rate (transfer time of the SCPI lines) and VXI-11 throughput (in bytes/s)
+        'baud': 9600,
+        'bandwidth': 50e6,
+
+        'smu': {
+            # Integration time of a reading (in s)
+            'integration': 0.02,
+            # Leakage current at full depletion (in A)
+            'leakage': 1e-7,
+            'noise': 0.01,
+        },
+        'stage': {
+            'serials': {'x': 30086, 'y': 30084, 'z': 30031},
+            'mm_per_step': 2.5e-3,
+            # Speed (in mm/s)
+            'speed': 5.0,
+        },
+        'tcp': {
+            '10.10.0.10:9221': 'PLH250P',
+            '10.10.0.20:5025': 'PiController',
+        },
+        'temperature': {
+            'stage': 20.0,
+            'holder': -20.0,
+            'humidity': 5.0,
+            'noise': 0.05,
+        },
+        'scope': {
+            'points': 2002,
+            'interval': 50e-12,
+            'offset': -20e-9,
+            # Noise of a single sweep (in V)
+            'noise': 0.002,
+            # Trigger rate without the laser (in Hz)
+            'rate': 1000,
+            # Dead time after each sweep (in s)
+            'dead_time': 0.0002,
+        },
+        'pulse': {
+            # Peak amplitude at full depletion, gain and laser power (in V)
+            'amplitude': 0.2,
+            'rise': 0.5e-9,
+            'decay': 3e-9,
+            'depletion': 200,
+            # Relative amplitude of the pulses without the laser (e.g. a source)
+            'source': 0.3,
+            # Beam: position of the edge along x, focus and width at the focus (in mm)
+            'edge': 0.0,
+            'focus': 47.0,
+            'sigma': 0.01,
+            # Increase of the beam width per mm distance from the focus
+            'divergence': 0.02,
+        },
+        # Relative gain vs. the supply voltage of the amplifier
+        'gain': [[5.93, 0.0], [6.19, 0.15], [7.10, 0.51], [7.81, 0.70], [9.15, 0.94], [10.60, 0.99], [12.0, 1.0]],
+    }
+
+    _instance = None
+    _create = threading.Lock()
+
+    def enabled():
+        return os.environ.get(Emulator.ENV, '') not in ['', '0']
+
+    def get():
+        with Emulator._create:
+            if Emulator._instance is None:
+                Emulator._instance = Emulator(Emulator._config())
+            return Emulator._instance
+
+    def _config():
+        config = copy.deepcopy(Emulator.DEFAULTS)
+
+        path = os.environ.get(Emulator.ENV, '')
+        if os.path.isfile(path):
+            with open(path, 'r') as f:
+                Emulator._merge(config, yaml.safe_load(f) or {})
+
+        return config
+
+    def _merge(config, update):
+        for key, value in update.items():
+            if isinstance(value, dict) and isinstance(config.get(key), dict):
+                Emulator._merge(config[key], value)
+            else:
+                config[key] = value
+
+
+    def __init__(self, config):
+        self.config = config
+        self.lock = threading.RLock()
+
+        # The emulated instruments, created when they are opened
+        self.smu = None
+        self.psu = None
+        self.pi = None
+        self.laser = None
+        self.scope = None
+        self.stages = {}
+
+        self._servers = {}
+
+    def latency(self, kind, size=0):
+        # Waits for the latency of an exchange, with the transfer time of `size` bytes
+        delay = self.config['latency'][kind]
+        if kind == 'serial':
+            delay += size*10/self.config['baud']
+        elif kind == 'vxi11':
+            delay += size/self.config['bandwidth']
+
+        if delay > 0:
+            time.sleep(delay)
+
+    def sleep(self, duration):
+        # Waits with the lock released, the other instruments can access the state in the meantime
+        if duration > 0:
+            self.lock.release()
+            try:
+                time.sleep(duration)
+            finally:
+                self.lock.acquire()
+
+
+    ## Instruments for the interfaces
+    def serial(self, port):
+        # Path of the pseudo terminal to open instead of the serial port
+        from .SMUEmulator import SMUEmulator
+
+        with self.lock:
+            if self.smu is None:
+                self.smu = SMUEmulator(self)
+            return self.smu.port
+
+    def address(self, ip, port):
+        # Local address of the TCP server emulating the instrument at ip:port
+        from .TCPEmulator import TCPEmulator
+
+        key = f'{ip}:{port}'
+        with self.lock:
+            if key not in self._servers:
+                kind = self.config['tcp'].get(key)
+                if kind is None:
+                    return None
+
+                server = TCPEmulator(self, kind)
+                self._servers[key] = server
+                if kind == 'PLH250P':
+                    self.psu = server.device
+                elif kind == 'PiController':
+                    self.pi = server.device
+
+            return self._servers[key].address
+
+    def vxi11(self, ip):
+        from .ScopeEmulator import ScopeEmulator
+
+        with self.lock:
+            if self.scope is None:
+                self.scope = ScopeEmulator(self)
+            return self.scope
+
+    def usb(self, vendor, product):
+        # List of the matching USB devices (only the laser)
+        from .LaserEmulator import LaserEmulator
+
+        with self.lock:
+            if self.laser is None:
+                self.laser = LaserEmulator(self)
+            return [self.laser]
+
+    def stage(self, serial):
+        from .pyximc import Stage
+
+        with self.lock:
+            if serial not in self.stages:
+                self.stages[serial] = Stage(self, serial)
+            return self.stages[serial]
+
+
+    ## Physical state
+    def position(self, axis):
+        # Position of the stage axis (in mm)
+        serial = self.config['stage']['serials'][axis]
+        stage = self.stages.get(serial)
+        return 0.0 if stage is None else stage.mm()
+
+    def bias(self):
+        return 0.0 if self.smu is None else self.smu.output()
+
+    def gain(self):
+        if self.psu is None:
+            return 0.0
+
+        points = np.array(self.config['gain'], dtype=float)
+        return float(np.interp(self.psu.output(), points[:, 0], points[:, 1], left=0, right=points[-1, 1]))
+
+    def triggerRate(self):
+        if self.laser is not None and self.laser.on:
+            return self.laser.frequency
+        return self.config['scope']['rate']
+
+    def illumination(self):
+        # Relative amount of light (or charge of the source) reaching the sensor
+        pulse = self.config['pulse']
+
+        if self.laser is None:
+            return pulse['source']
+        if not self.laser.on:
+            return 0.0
+
+        sigma = math.hypot(pulse['sigma'], pulse['divergence']*(self.position('z') - pulse['focus']))
+        edge = 0.5*(1 + math.erf((self.position('x') - pulse['edge'])/(math.sqrt(2)*sigma)))
+
+        return self.laser.dac/1023*edge
+
+    def amplitude(self):
+        # Peak amplitude of the TCT pulse (in V)
+        pulse = self.config['pulse']
+
+        voltage = self.bias()
+        collected = min(1.0, math.sqrt(abs(voltage)/pulse['depletion']))
+
+        return math.copysign(pulse['amplitude']*collected, voltage)*self.gain()*self.illumination()
+
+    def leakage(self, voltage):
+        # Leakage current of the sensor (in A)
+        smu = self.config['smu']
+        current = math.copysign(smu['leakage']*math.sqrt(abs(voltage)/self.config['pulse']['depletion']), voltage)
+        return current*(1 + smu['noise']*np.random.normal())
+
+    def pulse(self, t):
+        # Noise free pulse shape (normalised to a peak of 1) at the times t
+        pulse = self.config['pulse']
+
+        t = np.clip(t, 0, None)
+        shape = (1 - np.exp(-t/pulse['rise']))*np.exp(-t/pulse['decay'])
+
+        peak = pulse['rise']*math.log((pulse['rise'] + pulse['decay'])/pulse['rise'])
+        return shape/((1 - math.exp(-peak/pulse['rise']))*math.exp(-peak/pulse['decay']))
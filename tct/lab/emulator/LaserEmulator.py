@@ -0,0 +1,75 @@
+class LaserEmulator():
+    """Particulars laser, in place of the `usb.core.Device` of `InterfaceHIDParticulars`.
+
+    Decodes the reports sent by `LaserLA01` (frequency, DAC and the hardware sequence)."""
+
+    STATUS_BYTE = 6
+
+    class Endpoint():
+
+        def __init__(self, laser):
+            self.laser = laser
+
+        def read(self, size_or_buffer=64):
+            self.laser.emulator.latency('usb')
+
+            data = bytearray(size_or_buffer)
+            data[LaserEmulator.STATUS_BYTE] = 1 if self.laser.on else 0
+            return data
+
+    class Interface():
+
+        bInterfaceNumber = 0
+
+        def __init__(self, laser):
+            self._endpoint = LaserEmulator.Endpoint(laser)
+
+        def endpoints(self):
+            return [self._endpoint]
+
+    class Configuration():
+
+        def __init__(self, laser):
+            self._interface = LaserEmulator.Interface(laser)
+
+        def interfaces(self):
+            return [self._interface]
+
+
+    def __init__(self, emulator):
+        self.emulator = emulator
+
+        self.on = False
+        self.frequency = 1000
+        self.dac = 0
+
+        self._configuration = LaserEmulator.Configuration(self)
+
+    def __getitem__(self, index):
+        return self._configuration
+
+    def is_kernel_driver_active(self, interface):
+        return False
+
+    def detach_kernel_driver(self, interface):
+        pass
+
+    def dispose(self):
+        pass
+
+    def ctrl_transfer(self, bmRequestType, bRequest, wValue=0, wIndex=0, data_or_wLength=None):
+        self.emulator.latency('usb')
+
+        data = bytes(data_or_wLength)
+        with self.emulator.lock:
+            if data[0] == 99:
+                value = int.from_bytes(data[1:3], 'little')
+                self.frequency = 500000000/((value - 1)*180 + 440)
+            elif data[0] == 94:
+                self.dac = int.from_bytes(data[1:3], 'little')
+            elif data[0] == 91:
+                self.on = True
+            elif data[0] == 90:
+                self.on = False
+
+        return len(data)
@@ -0,0 +1,257 @@
+import os
+import threading
+import time
+import tty
+
+class SMUEmulator():
+    """Keithley SMU 2410, answering the SCPI commands of `SMU2410` on a pseudo terminal.
+
+    Compound commands (`;` separated) are answered with a single `;` separated reply.
+    Sweeps (`SOURCE1:VOLTAGE:MODE SWE` + `INIT`) step the output in real time, `*OPC?`
+    and `*WAI` block until they are completed. Like the 2400 series, the output returns to
+    the bias level (`SOURCE1:VOLTAGE:AMPLITUDE`) once a sweep is completed."""
+
+    IDN = 'KEITHLEY INSTRUMENTS INC.,MODEL 2410,EMULATOR,C34 Sep 21 2016 15:30:00/A02  /K/M'
+
+    ELEMENTS = ['VOLT', 'CURR', 'RES', 'TIME', 'STAT']
+
+    DEFAULTS = {
+        'SOURCE1:FUNCTION:MODE': 'VOLT',
+        'SOURCE1:VOLTAGE:MODE': 'FIX',
+        'SOURCE1:VOLTAGE:RANGE': 21.0,
+        'SOURCE1:VOLTAGE:RANGE:AUTO': 1,
+        'SOURCE1:CURRENT:RANGE': 1.05e-4,
+        'SOURCE1:CURRENT:RANGE:AUTO': 1,
+        'SOURCE1:CURRENT:AMPLITUDE': 0.0,
+        'SENSE1:CURRENT:RANGE': 1.05e-4,
+        'SENSE1:CURRENT:RANGE:AUTO': 1,
+        'SENSE1:VOLTAGE:RANGE': 21.0,
+        'SENSE1:VOLTAGE:RANGE:AUTO': 1,
+        'SENSE1:CURRENT:PROTECTION': 1.05e-4,
+        'SENSE1:VOLTAGE:PROTECTION': 21.0,
+        'SOURCE1:VOLTAGE:START': 0.0,
+        'SOURCE1:VOLTAGE:STOP': 0.0,
+        'SOURCE1:SWEEP:POINTS': 2500,
+        'SOURCE1:DELAY': 0.0,
+        'SOURCE1:DELAY:AUTO': 1,
+        'ARM:COUNT': 1,
+        'TRIGGER:COUNT': 1,
+        'TRIGGER:DELAY': 0.0,
+        'TRACE:POINTS': 100,
+        'TRACE:FEED:CONTROL': 'NEVER',
+    }
+
+    # Settings replied as integers
+    INTEGER = ['AUTO', 'COUNT', 'POINTS']
+
+    def __init__(self, emulator):
+        self.emulator = emulator
+
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+
+        self._reset()
+        self._start = time.time()
+
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _reset(self):
+        self.settings = dict(SMUEmulator.DEFAULTS)
+        self.on = False
+        self.amplitude = 0.0
+        self.sense = {'VOLTAGE', 'CURRENT'}
+
+        self.sweep = None
+        self.busy = 0
+        self.latest = None
+        self.trace = []
+
+    def _serve(self):
+        buffer = b''
+        while True:
+            try:
+                data = os.read(self.master, 4096)
+            except OSError:
+                return
+
+            buffer += data
+            while b'\n' in buffer:
+                line, buffer = buffer.split(b'\n', 1)
+                line = line.decode(errors='replace').strip('\r')
+
+                with self.emulator.lock:
+                    reply = self.handle(line)
+
+                self.emulator.latency('serial', len(line) + (0 if reply is None else len(reply)))
+                if reply is not None:
+                    os.write(self.master, reply.encode() + b'\n')
+
+
+    ## Emulated source
+    def output(self):
+        if not self.on:
+            return 0.0
+
+        if self.sweep is not None:
+            start, stop, points, delay, started = self.sweep
+            step = int((time.time() - started)/max(delay, 1e-3))
+            if step < points:
+                return start + step*(stop - start)/max(points - 1, 1)
+
+        # Fixed source, also after a completed sweep
+        return self.amplitude
+
+    def _reading(self):
+        voltage = self.output()
+
+        limit = self.settings['SENSE1:CURRENT:PROTECTION']
+        current = max(-limit, min(limit, self.emulator.leakage(voltage))) if self.on else 0.0
+
+        return [voltage, current, 9.91e37, time.time() - self._start, 0]
+
+    def _format(reading):
+        return ','.join('%+E'%(value) for value in reading)
+
+    def _wait(self):
+        # Blocks until the pending operations (sweep or buffered readings) are completed
+        self.emulator.sleep(self.busy - time.time())
+
+
+    ## SCPI
+    def handle(self, line):
+        if line == '\x03':
+            # Device clear
+            self.sweep = None
+            self.busy = 0
+            return 'DCL'
+
+        replies = []
+        for cmd in line.split(';'):
+            cmd = cmd.strip().lstrip(':')
+            if cmd == '':
+                continue
+
+            reply = self._command(cmd)
+            if reply is not None:
+                replies.append(reply)
+
+        if len(replies) == 0:
+            return None
+        return ';'.join(replies)
+
+    def _command(self, cmd):
+        parts = cmd.split(' ', 1)
+        header = parts[0].upper().replace('SENS1:', 'SENSE1:')
+        args = parts[1].strip() if len(parts) > 1 else ''
+        query = header.endswith('?')
+        header = header.rstrip('?')
+
+        if header == '*IDN':
+            return SMUEmulator.IDN
+        if header == '*RST':
+            self._reset()
+            return None
+        if header in ['*CLS', 'TRACE:CLEAR']:
+            if header == 'TRACE:CLEAR':
+                self.trace = []
+            return None
+        if header in ['*OPC', '*WAI']:
+            self._wait()
+            return '1' if query else None
+        if header == 'ABORT':
+            self.sweep = None
+            self.busy = 0
+            return None
+
+        if header == 'OUTPUT1:STATE':
+            if query:
+                return '1' if self.on else '0'
+            self.on = args in ['1', 'ON']
+            return None
+
+        if header == 'SOURCE1:VOLTAGE:AMPLITUDE':
+            if query:
+                return '%E'%(self.amplitude)
+            self.amplitude = float(args)
+            return None
+
+        if header in ['SENSE1:FUNC:ON', 'SENSE1:FUNC:OFF']:
+            function = args.strip('"').upper()
+            if header.endswith('ON'):
+                self.sense.add(function)
+            else:
+                self.sense.discard(function)
+            return None
+        if header == 'SENSE1:FUNC:STATE':
+            return '1' if args.strip('"').upper() in self.sense else '0'
+
+        if header == 'FORMAT:ELEMENTS':
+            return ','.join(SMUEmulator.ELEMENTS)
+
+        if header == 'INIT':
+            return self._init()
+        if header == 'READ':
+            self.emulator.sleep(self.emulator.config['smu']['integration'])
+            self.latest = self._reading()
+            return SMUEmulator._format(self.latest)
+        if header == 'SENSE1:DATA:LATEST':
+            if self.latest is None:
+                self.latest = self._reading()
+            return SMUEmulator._format(self.latest)
+        if header == 'TRACE:DATA':
+            self._wait()
+            return ','.join(SMUEmulator._format(reading) for reading in self.trace)
+
+        return self._setting(header, args, query)
+
+    def _setting(self, header, args, query):
+        if query:
+            value = self.settings.get(header)
+            if value is None:
+                return '0'
+            if isinstance(value, str):
+                return value
+            if any(header.endswith(suffix) for suffix in SMUEmulator.INTEGER):
+                return '%i'%(value)
+            return '%E'%(value)
+
+        value = args.upper()
+        if value in ['ON', 'OFF']:
+            value = 1 if value == 'ON' else 0
+        elif value in ['INF']:
+            value = 0
+        else:
+            try:
+                value = float(value)
+            except ValueError:
+                pass
+
+        self.settings[header] = value
+        if header.endswith(':RANGE'):
+            # A fixed range disables the auto range
+            self.settings[header + ':AUTO'] = 0
+        if header == 'SOURCE1:VOLTAGE:MODE' and value != 'SWE':
+            self.sweep = None
+
+        return None
+
+    def _init(self):
+        count = int(self.settings['TRIGGER:COUNT'])
+
+        if self.settings['SOURCE1:VOLTAGE:MODE'] == 'SWE':
+            points = int(self.settings['SOURCE1:SWEEP:POINTS'])
+            delay = self.settings['SOURCE1:DELAY'] + self.emulator.config['smu']['integration']
+            self.sweep = (self.settings['SOURCE1:VOLTAGE:START'], self.settings['SOURCE1:VOLTAGE:STOP'], points, delay, time.time())
+            self.busy = time.time() + points*delay
+            return None
+
+        # Readings into the trace buffer
+        delay = self.settings['TRIGGER:DELAY'] + self.emulator.config['smu']['integration']
+        self.busy = time.time() + count*delay
+        if self.settings['TRACE:FEED:CONTROL'] == 'NEXT':
+            self.trace = [self._reading() for ii in range(min(count, int(self.settings['TRACE:POINTS'])))]
+            self.latest = self.trace[-1]
+
+        return None
@@ -0,0 +1,290 @@
+import re
+import time
+
+import numpy as np
+import vxi11
+
+from ..Lecroy.WaveDesc import WaveDesc
+
+class ScopeEmulator():
+    """WaveRunner 8104, in place of the `vxi11.Instrument` of `InterfaceVXI11`.
+
+    Answers the VBS and remote commands of `WaveRunner8104`. The sweeps are counted from
+    the trigger rate (laser frequency) while the trigger is running. The waveforms are
+    generated at the transfer from the current state of the setup: the TCT pulse on the
+    signal channels, the laser sync on the trigger channel and noise which decreases with
+    the number of averaged sweeps."""
+
+    CHANNELS = ['C1', 'C2', 'C3', 'C4']
+    MEASURE = ['p1', 'p2', 'p3', 'p4', 'p5', 'p6', 'p7', 'p8']
+
+    # Channel of the laser sync and channels showing the TCT pulse
+    TRIGGER = 'C1'
+    SIGNAL = ['C2']
+
+    N_DIV = 8
+    MAX_VALUE = 32512
+    MIN_VALUE = -32768
+
+    def __init__(self, emulator):
+        self.emulator = emulator
+
+        self.channel = {ch: {'averagesweeps': 1, 'verscale': 0.5, 'veroffset': 0.0} for ch in ScopeEmulator.CHANNELS}
+        self.horizontal = {'samplemode': 'RealTime', 'numsegments': 1}
+        self.measure = {msr: {'paramengine': 'Null', 'source1': 'C2'} for msr in ScopeEmulator.MEASURE}
+
+        # Transfer window: first point, number of points (0 = all) and sparsing
+        self.window = (0, 0, 1)
+        self.memory = {}
+
+        self.mode = 'normal'
+        self._sweeps = 0
+        self._running = time.time()
+        self._sequence = None
+
+    ## vxi11.Instrument
+    def write(self, cmd):
+        self._handle(cmd)
+
+    def ask(self, cmd):
+        reply = self._handle(cmd)
+        return '' if reply is None else str(reply)
+
+    def ask_raw(self, data):
+        cmd = data.decode()
+        reply = b''.join(self._waveform(query) for query in cmd.split(';'))
+
+        self.emulator.latency('vxi11', len(reply))
+        return reply
+
+
+    ## Acquisition
+    def _rate(self):
+        # Sweeps per second, including the dead time
+        return 1/(1/self.emulator.triggerRate() + self.emulator.config['scope']['dead_time'])
+
+    def sweeps(self):
+        if self._running is None:
+            return self._sweeps
+        return self._sweeps + int((time.time() - self._running)*self._rate())
+
+    def _setMode(self, mode):
+        mode = mode.lower()
+        self._sweeps = self.sweeps()
+        self._running = None
+        self._sequence = None
+
+        if mode in ['normal', 'auto']:
+            self._running = time.time()
+        elif mode == 'single':
+            segments = self.horizontal['numsegments'] if self.horizontal['samplemode'].lower() == 'sequence' else 1
+            self._sequence = (time.time() + segments/self._rate(), segments)
+
+        self.mode = mode
+
+    def _clear(self):
+        self._sweeps = 0
+        if self._running is not None:
+            self._running = time.time()
+
+    def _acquire(self, timeout):
+        self.emulator.sleep(1/self._rate())
+        self._sweeps = self.sweeps() + 1
+        return '1'
+
+    def _waitUntilIdle(self, timeout):
+        if self._sequence is None:
+            return '-1'
+
+        done, segments = self._sequence
+        remaining = done - time.time()
+        if remaining > timeout:
+            self.emulator.sleep(timeout)
+            return '0'
+
+        self.emulator.sleep(remaining)
+        self._sweeps += segments
+        self._sequence = None
+        self.mode = 'stopped'
+        return '-1'
+
+
+    ## Waveforms
+    def _time(self):
+        config = self.emulator.config['scope']
+        return config['offset'] + config['interval']*np.arange(config['points'])
+
+    def _voltage(self, ch, sweeps=1):
+        # Averaged waveform of a channel (in V)
+        t = self._time()
+
+        if ch == ScopeEmulator.TRIGGER:
+            y = 0.8*((t >= 0) & (t < 5e-9))
+        elif ch in ScopeEmulator.SIGNAL:
+            y = self.emulator.amplitude()*self.emulator.pulse(t)
+        else:
+            y = np.zeros(len(t))
+
+        noise = self.emulator.config['scope']['noise']
+        return y + noise/np.sqrt(max(sweeps, 1))*np.random.normal(size=len(t))
+
+    def _trace(self, ch):
+        # Samples of the acquired trace of a channel, as (samples, gain, offset, segments)
+        if ch in self.memory:
+            return self.memory[ch]
+
+        channel = self.channel[ch]
+        if self.horizontal['samplemode'].lower() == 'sequence':
+            segments = self.horizontal['numsegments']
+            y = np.concatenate([self._voltage(ch) for ii in range(segments)])
+        else:
+            segments = 1
+            y = self._voltage(ch, min(self.sweeps(), channel['averagesweeps']))
+
+        gain = 0.5*ScopeEmulator.N_DIV*channel['verscale']/ScopeEmulator.MAX_VALUE
+        offset = channel['veroffset']
+        samples = np.clip(np.round((y + offset)/gain), ScopeEmulator.MIN_VALUE, ScopeEmulator.MAX_VALUE)
+
+        return samples.astype('<i2'), gain, offset, segments
+
+    def _waveform(self, query):
+        match = re.match(r'\s*(C\d|M\d):WF\?', query, re.IGNORECASE)
+        if match is None:
+            return b''
+
+        samples, gain, offset, segments = self._trace(match.group(1).upper())
+
+        first, points, sparsing = self.window if segments == 1 else (0, 0, 1)
+        samples = samples[first::sparsing]
+        if points > 0:
+            samples = samples[:points]
+
+        config = self.emulator.config['scope']
+        source = ScopeEmulator.CHANNELS.index(match.group(1).upper()) if match.group(1).upper() in ScopeEmulator.CHANNELS else 0
+
+        block = WaveDesc.build(samples, gain, offset, config['interval'], config['offset'], source=source,
+            first_point=first, sparsing=sparsing, segments=segments, trigger_interval=1/self._rate())
+        return b'WF,' + block + b'\n'
+
+    def _measure(self, msr):
+        settings = self.measure[msr]
+        ch = settings['source1'].upper()
+        if ch not in self.channel:
+            return 'No Data'
+
+        samples, gain, offset, segments = self._trace(ch)
+        y = gain*samples.astype(float) - offset
+        t = self._time()[:len(y)]
+
+        engine = settings['paramengine'].lower()
+        if engine == 'maximum':
+            return '%E'%(np.max(y))
+        if engine == 'minimum':
+            return '%E'%(np.min(y))
+        if engine == 'area':
+            return '%E'%(np.trapz(y, t))
+
+        # Amplitude and edges relative to the baseline before the trigger
+        base = np.mean(y[t < 0]) if np.any(t < 0) else 0.0
+        peak = np.argmax(np.abs(y - base))
+        top = y[peak]
+        if engine == 'amplitude':
+            return '%E'%(top - base)
+
+        level = np.abs((y - base)/(top - base)) if top != base else np.zeros(len(y))
+        if engine == 'rise':
+            edge = level[:peak + 1]
+            if np.all(edge < 0.9) or np.all(edge > 0.1):
+                return 'No Data'
+            return '%E'%(t[np.argmax(edge >= 0.9)] - t[np.max(np.nonzero(edge <= 0.1))])
+        if engine == 'fall':
+            edge = level[peak:]
+            if np.all(edge > 0.1):
+                return 'No Data'
+            return '%E'%(t[peak + np.argmax(edge <= 0.1)] - t[peak + np.max(np.nonzero(edge >= 0.9))])
+
+        return 'No Data'
+
+
+    ## Commands
+    def _handle(self, cmd):
+        self.emulator.latency('vxi11', len(cmd))
+
+        with self.emulator.lock:
+            cmd = cmd.strip()
+            match = re.match(r"vbs(\?)?\s*'(.*)'", cmd, re.IGNORECASE | re.DOTALL)
+            if match is not None:
+                if match.group(1):
+                    expr = re.sub(r'^return\s*=\s*', '', match.group(2).strip(), flags=re.IGNORECASE)
+                    return ','.join(str(self._get(part.strip())) for part in expr.split('& "," &'))
+
+                for statement in match.group(2).split(' : '):
+                    self._set(statement.strip())
+                return None
+
+            header, args = (cmd.split(' ', 1) + [''])[:2]
+            header = header.upper()
+            if header == '*IDN?':
+                return 'LECROY,WR8104,EMULATOR,8.1.0'
+            if header == 'WAVEFORM_SETUP':
+                values = args.split(',')
+                settings = dict(zip(values[0::2], values[1::2]))
+                self.window = (int(settings.get('FP', 0)), int(settings.get('NP', 0)), max(1, int(settings.get('SP', 1))))
+            elif header == 'STORE':
+                source, memory = [value.strip().upper() for value in args.split(',')]
+                self.memory[memory] = self._trace(source)
+            elif header == '*RST':
+                self.__init__(self.emulator)
+
+            return None
+
+    def _get(self, expr):
+        path = expr.lower().split('.')
+
+        match = re.match(r'app\.acquisition\.acquire\((\d+)', expr, re.IGNORECASE)
+        if match is not None:
+            return self._acquire(float(match.group(1)))
+        match = re.match(r'app\.waituntilidle\((\d+)', expr, re.IGNORECASE)
+        if match is not None:
+            return self._waitUntilIdle(float(match.group(1)))
+
+        if path[:2] == ['app', 'acquisition'] and len(path) > 3 and path[2].upper() in self.channel:
+            if path[3:] == ['out', 'result', 'sweeps']:
+                return self.sweeps()
+            return self.channel[path[2].upper()].get(path[3], '')
+
+        if path[:3] == ['app', 'acquisition', 'horizontal']:
+            return self.horizontal.get(path[3], '')
+        if path[:3] == ['app', 'acquisition', 'triggermode']:
+            return self.mode
+
+        if path[:2] == ['app', 'measure'] and path[3:] == ['out', 'result', 'value']:
+            return self._measure(path[2])
+
+        raise vxi11.vxi11.Vxi11Exception(f'Unknown VBS expression [{expr}]', 'ask')
+
+    def _set(self, statement):
+        lhs, value = (statement.split('=', 1) + [None])[:2]
+        path = lhs.strip().lower().split('.')
+        if value is not None:
+            value = value.strip().strip('"')
+
+        if path[:2] == ['app', 'acquisition'] and len(path) > 3 and path[2].upper() in self.channel:
+            channel = self.channel[path[2].upper()]
+            if path[3] == 'clearsweeps':
+                self._clear()
+            elif path[3] == 'averagesweeps':
+                channel['averagesweeps'] = int(value)
+            elif path[3] in ['verscale', 'veroffset']:
+                channel[path[3]] = float(value)
+            elif path[3] == 'findscale':
+                y = self._voltage(path[2].upper())
+                channel['verscale'] = max(2*np.max(np.abs(y))/ScopeEmulator.N_DIV, 1e-3)
+                channel['veroffset'] = 0.0
+
+        elif path[:3] == ['app', 'acquisition', 'horizontal']:
+            self.horizontal[path[3]] = int(value) if path[3] == 'numsegments' else value
+        elif path[:3] == ['app', 'acquisition', 'triggermode']:
+            self._setMode(value)
+        elif path[:2] == ['app', 'measure'] and path[2] in self.measure and value is not None:
+            self.measure[path[2]][path[3]] = value
@@ -0,0 +1,103 @@
+import socketserver
+import threading
+
+import numpy as np
+
+class TCPEmulator():
+    """Line based TCP server on localhost, answering the commands of `PLH250P` or `PiController`."""
+
+    class PLH250P():
+
+        def __init__(self, emulator):
+            self.emulator = emulator
+            self.on = False
+            self.voltage = 0.0
+            self.current = 0.0
+            self.range = 2
+
+        def output(self):
+            return self.voltage if self.on else 0.0
+
+        def handle(self, cmd):
+            parts = cmd.split(' ', 1)
+            header = parts[0].upper()
+            args = parts[1].strip() if len(parts) > 1 else ''
+
+            if header == '*IDN?':
+                return 'THURLBY THANDAR, PLH250-P, 000000, 1.00-EMULATOR'
+            if header == 'OP1?':
+                return '1' if self.on else '0'
+            if header == 'OP1':
+                self.on = args == '1'
+            elif header == 'V1?':
+                return 'V1 %.3f'%(self.voltage)
+            elif header == 'V1':
+                self.voltage = float(args)
+            elif header == 'I1?':
+                return 'I1 %.3f'%(self.current)
+            elif header == 'I1':
+                self.current = float(args)
+            elif header == 'V1O?':
+                return '%.3fV'%(self.output())
+            elif header == 'I1O?':
+                # Quiescent current of the amplifier
+                return '%.3fA'%(min(self.current, 0.01*self.output()) if self.on else 0.0)
+            elif header == 'IRANGE1?':
+                return '%i'%(self.range)
+            elif header == 'IRANGE1':
+                self.range = int(args)
+
+            return None
+
+    class PiController():
+
+        def __init__(self, emulator):
+            self.emulator = emulator
+
+        def handle(self, cmd):
+            config = self.emulator.config['temperature']
+            values = {
+                'STAGE:TEMP?': config['stage'],
+                'HOLDER:TEMP?': config['holder'],
+                'HOLDER:HUMIDITY?': config['humidity'],
+            }
+
+            value = values.get(cmd.strip().upper())
+            if value is None:
+                return None
+            return '%.2f'%(value + config['noise']*np.random.normal())
+
+
+    class Handler(socketserver.StreamRequestHandler):
+
+        def handle(self):
+            emulator = self.server.emulator
+            for line in self.rfile:
+                cmd = line.decode(errors='replace').strip('\r\n')
+
+                with emulator.lock:
+                    reply = self.server.device.handle(cmd)
+
+                emulator.latency('tcp')
+                if reply is not None:
+                    self.wfile.write(reply.encode() + b'\n')
+
+
+    def __init__(self, emulator, kind):
+        devices = {
+            'PLH250P': TCPEmulator.PLH250P,
+            'PiController': TCPEmulator.PiController,
+        }
+        if kind not in devices:
+            raise Exception(f'Unknown emulated TCP instrument [{kind}]! Valid: {list(devices)}')
+
+        self.device = devices[kind](emulator)
+
+        self.server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), TCPEmulator.Handler)
+        self.server.daemon_threads = True
+        self.server.emulator = emulator
+        self.server.device = self.device
+        self.address = self.server.server_address
+
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
@@ -0,0 +1 @@
+from .Emulator import Emulator
@@ -0,0 +1,144 @@
+"""Emulated stages, in place of the libximc binding `Standa/pyximc.py`.
+
+Only the functions and structures used by `Ximc8SMC5USB` are provided. The stages
+move at a constant speed, `command_wait_for_stop` blocks until they arrived."""
+
+import ctypes
+import time
+
+from .Emulator import Emulator
+
+USTEPS = 256
+
+class StateFlags:
+    STATE_IS_HOMED = 0x0000020
+
+class status_t(ctypes.Structure):
+    _fields_ = [
+        ("Flags", ctypes.c_uint),
+        ("CurPosition", ctypes.c_int),
+        ("uCurPosition", ctypes.c_int),
+        ("Ipwr", ctypes.c_int),
+        ("Upwr", ctypes.c_int),
+        ("CurT", ctypes.c_int),
+    ]
+
+class get_position_t(ctypes.Structure):
+    _fields_ = [
+        ("Position", ctypes.c_int),
+        ("uPosition", ctypes.c_int),
+        ("EncPosition", ctypes.c_longlong),
+    ]
+
+
+class Stage():
+
+    def __init__(self, emulator, serial):
+        self.emulator = emulator
+        self.serial = serial
+
+        # Absolute position from the home switch and the user zero (in steps)
+        self.absolute = 0.0
+        self.zero = 0.0
+        self.homed = True
+
+        self._move = None
+
+    def _speed(self):
+        # steps/s
+        config = self.emulator.config['stage']
+        return config['speed']/config['mm_per_step']
+
+    def current(self):
+        if self._move is not None:
+            start, target, started = self._move
+            travelled = (time.time() - started)*self._speed()
+            if travelled >= abs(target - start):
+                self.absolute = target
+                self._move = None
+            else:
+                return start + travelled*(1 if target > start else -1)
+
+        return self.absolute
+
+    def position(self):
+        return self.current() - self.zero
+
+    def mm(self):
+        return self.position()*self.emulator.config['stage']['mm_per_step']
+
+    def moveTo(self, absolute):
+        self.absolute = self.current()
+        self._move = (self.absolute, absolute, time.time())
+
+    def remaining(self):
+        if self._move is None:
+            return 0.0
+        start, target, started = self._move
+        return max(0.0, started + abs(target - start)/self._speed() - time.time())
+
+
+class lib:
+
+    _ids = {}
+
+    def _stage(id):
+        Emulator.get().latency('ximc')
+        return Emulator.get().stage(lib._ids[id])
+
+    def open_device(dev_str):
+        serial = int(dev_str.decode().rsplit('/', 1)[-1], 16)
+
+        id = len(lib._ids)
+        lib._ids[id] = serial
+        Emulator.get().stage(serial)
+        return id
+
+    def close_device(id):
+        return 0
+
+    def get_status(id, status):
+        stage = lib._stage(id)
+        status = status._obj
+
+        position = stage.position()
+        status.Flags = StateFlags.STATE_IS_HOMED if stage.homed else 0
+        status.CurPosition = int(position)
+        status.uCurPosition = int(round((position - int(position))*USTEPS))
+        status.Ipwr = 300
+        status.Upwr = 12000
+        status.CurT = 300
+        return 0
+
+    def get_position(id, pos):
+        stage = lib._stage(id)
+        pos = pos._obj
+
+        position = stage.position()
+        pos.Position = int(position)
+        pos.uPosition = int(round((position - int(position))*USTEPS))
+        pos.EncPosition = 0
+        return 0
+
+    def command_home(id):
+        stage = lib._stage(id)
+        stage.moveTo(0.0)
+        stage.homed = True
+        return 0
+
+    def command_zero(id):
+        stage = lib._stage(id)
+        stage.zero = stage.current()
+        return 0
+
+    def command_move(id, steps, usteps):
+        stage = lib._stage(id)
+        stage.moveTo(stage.zero + steps + usteps/USTEPS)
+        return 0
+
+    def command_wait_for_stop(id, interval):
+        stage = lib._stage(id)
+        while stage.remaining() > 0:
+            time.sleep(min(stage.remaining(), interval*1e-3))
+        stage.current()
+        return 0
@@ -3,6 +3,7 @@ import usb.util
 import time
 
 from ...logger import CommLogger
+from ..emulator import Emulator
 
 # This implementation is based and partially copied from the work done by Matías Senger at UZH
 # https://github.com/SengerM/PyticularsTCT/blob/master/PyticularsTCT/ParticularsLaserController.py
@@ -50,7 +51,10 @@ class InterfaceHIDParticulars:
 
     def _openDevice(self):
         # Find all corresponding devices
-        devices = list(usb.core.find(idVendor=self.id_vendor, idProduct=self.id_product, find_all=True))
+        if Emulator.enabled():
+            devices = Emulator.get().usb(self.id_vendor, self.id_product)
+        else:
+            devices = list(usb.core.find(idVendor=self.id_vendor, idProduct=self.id_product, find_all=True))
         if len(devices) < 1:
             raise InterfaceHIDParticulars.CommError(self, 'Could not find any matching USB devices!')
 
@@ -72,7 +76,10 @@ class InterfaceHIDParticulars:
 
     def _closeDevice(self):
         if self.device is not None:
-            usb.util.dispose_resources(self.device)
+            if Emulator.enabled():
+                self.device.dispose()
+            else:
+                usb.util.dispose_resources(self.device)
 
 
     def close(self):
@@ -2,6 +2,7 @@ import socket
 import time
 
 from ...logger import CommLogger
+from ..emulator import Emulator
 
 class InterfaceIP:
 
@@ -52,9 +53,17 @@ class InterfaceIP:
             self.log.error(str(error))
             raise error
 
+        address = (self.ip, self.port)
+        if Emulator.enabled():
+            address = Emulator.get().address(self.ip, self.port)
+            if address is None:
+                error = self.CommError(self, 'No emulated instrument at the IP!')
+                self.log.error(str(error))
+                raise error
+
         try:
             #Connect to remote server
-            self.sock.connect((self.ip , self.port))
+            self.sock.connect(address)
         except socket.error:
             error = self.CommError(self, 'Failed to connect to the IP!')
             self.log.error(str(error))
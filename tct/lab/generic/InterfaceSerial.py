@@ -1,10 +1,13 @@
 import serial
-import time
 
 from ...logger import CommLogger
+from ..emulator import Emulator
 
 class InterfaceSerial:
 
+    # Read timeout for a reply (in s)
+    TIMEOUT = 5
+
     class CommError(Exception):
 
         def __init__(self, iface, msg, op=None, ret=None):
@@ -25,6 +28,8 @@ class InterfaceSerial:
     def __init__(self, port, baud, log=None, line_end=b'\n', serial_config=None):
         if serial_config is None:
             serial_config = {}
+        # Replies are read until the terminator, the timeout only applies to missing replies
+        serial_config.setdefault('timeout', InterfaceSerial.TIMEOUT)
 
         self.port = port
         self.baud = baud
@@ -42,7 +47,8 @@ class InterfaceSerial:
 
 
     def _openPort(self):
-        self._if = serial.Serial(self.port, self.baud, **self.serial_config)
+        port = Emulator.get().serial(self.port) if Emulator.enabled() else self.port
+        self._if = serial.Serial(port, self.baud, **self.serial_config)
 
     def _closePort(self):
         if self._if is not None:
@@ -53,13 +59,14 @@ class InterfaceSerial:
         self._closePort()
 
 
-    def query(self, cmd, resp=False, len=4096):
+    def query(self, cmd, resp=False, len=4096, timeout=None):
         """
         Sends a command to the instrument and receives data if needed.
 
         The cmd string is encoded to bytes and a NEWLINE is appended.
         This function waits to receive data in return if resp=True is passed as an argument.
         The returned data is decoded into a string and the NEWLINE is stripped.
+        A longer timeout can be given for replies to slow operations.
         """
 
         if self._if is None:
@@ -68,10 +75,22 @@ class InterfaceSerial:
         self.log.sent(cmd)
         #Send cmd string
         self._if.write(cmd.encode() + self.line_end)
-        time.sleep(0.02)
+        self._if.flush()
 
         if resp:
-            reply = self._if.read_until(self.line_end)
+            default = self._if.timeout
+            if timeout is not None:
+                self._if.timeout = timeout
+            try:
+                reply = self._if.read_until(self.line_end)
+            finally:
+                self._if.timeout = default
+
+            if not reply.endswith(self.line_end):
+                # Discard a partial reply, to not mix it up with the next one
+                self._if.reset_input_buffer()
+                raise InterfaceSerial.CommError(self, f'No complete reply within {self._if.timeout}s!', cmd, reply)
+
             reply = reply.decode().strip('\n\r')
 
             self.log.recv(reply)
@@ -80,12 +99,35 @@ class InterfaceSerial:
         else:
             return True
 
+    def batch(self, cmds, timeout=None):
+        """
+        Sends several SCPI commands as a single line (compound command) in one round trip.
+
+        Each command is sent from the root of the command tree (`;:` separated).
+        Returns a list with the reply to each query (commands containing a `?`), in order.
+        """
+
+        line = ';'.join(':' + cmd.lstrip(':') for cmd in cmds)
+        queries = len([cmd for cmd in cmds if '?' in cmd])
+
+        if queries == 0:
+            self.query(line)
+            return []
+
+        reply = self.query(line, resp=True, timeout=timeout)
+        values = reply.split(';')
+        if len(values) != queries:
+            raise InterfaceSerial.CommError(self, f'Expected {queries} replies to compound command!', line, reply)
+
+        return values
+
     ## -----------------------------------------
 
     def id(self):
         return self.query("*IDN?", True)
 
+    # Both commands do not send a reply
     def cls(self):
-        return self.query("*CLS", True)
+        return self.query("*CLS")
     def rst(self):
-        return self.query("*RST", True)
+        return self.query("*RST")
@@ -1,6 +1,9 @@
+import threading
+
 import vxi11
 
 from ...logger import CommLogger
+from ..emulator import Emulator
 
 class InterfaceVXI11():
 
@@ -26,6 +29,9 @@ class InterfaceVXI11():
 
         self.log = CommLogger(log, type(self).__name__)
 
+        # Queries can be issued from different threads (e.g. reading a waveform in the background)
+        self._lock = threading.RLock()
+
         self.conn = None
         self._openVXI11()
 
@@ -33,7 +39,10 @@ class InterfaceVXI11():
         self._closeVXI11()
 
     def _openVXI11(self):
-        self.conn = vxi11.Instrument(self.ip)
+        if Emulator.enabled():
+            self.conn = Emulator.get().vxi11(self.ip)
+        else:
+            self.conn = vxi11.Instrument(self.ip)
 
     def _closeVXI11(self):
         pass
@@ -46,13 +55,14 @@ class InterfaceVXI11():
         Sends a command to the instrument and receives data if needed.
         """
 
-        if resp:
-            if raw:
-                return self.conn.ask_raw(cmd.encode())
+        with self._lock:
+            if resp:
+                if raw:
+                    return self.conn.ask_raw(cmd.encode())
+                else:
+                    return self.conn.ask(cmd)
             else:
-                return self.conn.ask(cmd)
-        else:
-            self.conn.write(cmd)
+                self.conn.write(cmd)
 
         return True
 
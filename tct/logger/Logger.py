@@ -1,3 +1,4 @@
+import threading
 import time
 
 class Logger():
@@ -11,6 +12,9 @@ class Logger():
         self.print = print
         self.debug = debug
 
+        # Instruments are also controlled from worker threads
+        self._lock = threading.Lock()
+
         self.out = []
         for ff, file in enumerate(self.files):
             self.out.append(open(file, 'a'))
@@ -28,8 +32,9 @@ class Logger():
 
     def log(self, cat, msg):
         line = "(%s) [%s]: %s"%(time.strftime("%Y-%m-%d %H:%M:%S"), cat, '\n>> '.join(msg.split('\n')))
-        for stream in self.out:
-            if not stream.closed:
-                stream.write(line + "\n")
-        if self.print:
-            print(line)
+        with self._lock:
+            for stream in self.out:
+                if not stream.closed:
+                    stream.write(line + "\n")
+            if self.print:
+                print(line)
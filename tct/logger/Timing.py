@@ -0,0 +1,156 @@
+import contextlib
+import threading
+import time
+from datetime import datetime
+
+class Timing():
+    """Time spent in the phases of a scan (e.g. setting the state, averaging or writing).
+
+    Phases are measured with `with timing.measure('transfer'): ...`, also from several
+    threads (e.g. the storage worker). Nested phases are exclusive: the time of an inner
+    phase is not counted for the outer one (e.g. the transfer within the autoscale), so the
+    phases add up to the measured time. Phases measured in other threads than the one which
+    called `reset()` (e.g. the concurrent transitions of `Setup` or the storage worker)
+    overlap with these and are therefore reported separately as `concurrent`.
+
+    Besides the statistics of the whole scan, the phases of each entry are recorded in a
+    `Record`, started with `begin()`. Phases of an entry measured after the next entry was
+    begun (e.g. storing in the background) are assigned to it via `record()`."""
+
+    class Record():
+        """Phases of a single scan entry: start (relative to the entry) and duration (in s)."""
+
+        def __init__(self):
+            self.start = time.time()
+
+            self._lock = threading.Lock()
+            self._phases = {}
+
+        def add(self, phase, start, duration):
+            with self._lock:
+                if phase in self._phases:
+                    # Repeated phases (e.g. a second acquisition) are summed up
+                    first, total = self._phases[phase]
+                    self._phases[phase] = (first, total + duration)
+                else:
+                    self._phases[phase] = (start - self.start, duration)
+
+        def columns(self, prefix='timing.'):
+            # Columns of the scan list
+            columns = {prefix + 'start': datetime.fromtimestamp(self.start).isoformat()}
+            with self._lock:
+                for phase, (start, duration) in self._phases.items():
+                    columns[f'{prefix}{phase}'] = duration
+                    columns[f'{prefix}{phase}.start'] = start
+
+            return columns
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        # Record of the entry in acquisition
+        self._record = None
+
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            # phase: [count, total, max] (in s), of the resetting thread and of the others
+            self._phases = {}
+            self._concurrent = {}
+            self._main = threading.get_ident()
+            self._start = time.time()
+
+    def _stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def begin(self):
+        # Starts the record of the next entry, also used by the phases measured in other threads
+        record = Timing.Record() if self.enabled else None
+        self._record = record
+        return record
+
+    def end(self):
+        self._record = None
+
+    @contextlib.contextmanager
+    def record(self, record):
+        # Assigns the phases measured in this thread to the given record
+        previous = getattr(self._local, 'record', None)
+        self._local.record = record
+        try:
+            yield record
+        finally:
+            self._local.record = previous
+
+    @contextlib.contextmanager
+    def measure(self, phase):
+        if not self.enabled:
+            yield
+            return
+
+        # Entry: [phase, start, time of the nested phases]
+        stack = self._stack()
+        start = time.time()
+        entry = [phase, time.perf_counter(), 0.0]
+        stack.append(entry)
+        try:
+            yield
+        finally:
+            stack.pop()
+            elapsed = time.perf_counter() - entry[1]
+            if len(stack) > 0:
+                stack[-1][2] += elapsed
+
+            self.add(phase, elapsed - entry[2], start)
+
+    def add(self, phase, duration, start=None):
+        if not self.enabled:
+            return
+
+        record = getattr(self._local, 'record', None) or self._record
+        if record is not None:
+            record.add(phase, time.time() - duration if start is None else start, duration)
+
+        with self._lock:
+            phases = self._phases if threading.get_ident() == self._main else self._concurrent
+            stats = phases.setdefault(phase, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += duration
+            stats[2] = max(stats[2], duration)
+
+    def total(self, phase):
+        with self._lock:
+            return sum(phases.get(phase, [0, 0.0, 0.0])[1] for phases in [self._phases, self._concurrent])
+
+    def _statistics(phases, elapsed):
+        return {phase: {
+            'count': stats[0],
+            'total': stats[1],
+            'mean': stats[1]/stats[0],
+            'max': stats[2],
+            'fraction': stats[1]/elapsed if elapsed > 0 else 0.0,
+        } for phase, stats in phases.items()}
+
+    def summary(self, entries=None):
+        # Statistics of all phases (in s), with the throughput if the number of entries is given.
+        # The fractions of the phases and the untimed rest add up to 1, the concurrent phases overlap with them.
+        with self._lock:
+            elapsed = time.time() - self._start
+            phases = Timing._statistics(self._phases, elapsed)
+            concurrent = Timing._statistics(self._concurrent, elapsed)
+
+        summary = {'elapsed': elapsed}
+        if entries is not None:
+            summary['entries'] = entries
+            summary['entries_per_hour'] = entries/elapsed*3600 if elapsed > 0 else 0.0
+        summary['phases'] = phases
+        summary['untimed'] = max(0.0, elapsed - sum(stats['total'] for stats in phases.values()))
+        summary['concurrent'] = concurrent
+
+        return summary
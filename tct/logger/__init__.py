@@ -1,2 +1,3 @@
 from .Logger import Logger
 from .CommLogger import CommLogger
+from .Timing import Timing
@@ -0,0 +1,135 @@
+import itertools
+import threading
+
+import numpy as np
+
+from ..data import FigureOfMerit
+from .Scan import Scan
+
+class AdaptiveScan(Scan):
+    """Scan which refines the innermost parameter where the figure of merit changes most.
+
+    For every combination of the outer parameters, the given values of the innermost
+    parameter are scanned first (coarse grid). Then new points are inserted in the middle
+    of the intervals with the largest change of the figure of merit, until all changes are
+    below `tolerance` (fraction of the range of the figure of merit in this row), the
+    intervals are narrower than `min_step` or the budget of `points` per row is used.
+
+    The figure of merit of each acquired entry has to be reported via `feedback()`, which
+    can be called from another thread (e.g. the storage worker). Report None if an entry
+    failed, the iteration waits for the feedback of all entries of a row before refining
+    and raises if it is missing after `FEEDBACK_TIMEOUT`."""
+
+    # Maximum time to wait for the feedback of a row (in s)
+    FEEDBACK_TIMEOUT = 60
+
+    def __init__(self, fom, points, tolerance=0.05, min_step=None):
+        super().__init__()
+
+        self.fom = FigureOfMerit(fom)
+        self.points = int(points)
+        self.tolerance = float(tolerance)
+        self.min_step = min_step
+
+        self._feedback = {}
+        self._condition = threading.Condition()
+
+    def _inner(self):
+        return self._parameters[-1]
+
+    def count(self):
+        # Upper bound, the refinement of a row might stop earlier
+        if len(self._parameters) == 0:
+            return 0
+
+        total = max(self.points, len(self._values[self._inner()]))
+        for param in self._parameters[:-1]:
+            total *= len(self._values[param])
+
+        return total
+
+    def grid(self):
+        # The coarse grid as a regular scan (e.g. for the duration prediction)
+        return self.reorder(self._parameters)
+
+    def feedback(self, entry, value):
+        with self._condition:
+            self._feedback[entry.key] = value
+            self._condition.notify_all()
+
+    def _waitFeedback(self, keys):
+        with self._condition:
+            if not self._condition.wait_for(lambda: all(key in self._feedback for key in keys), timeout=AdaptiveScan.FEEDBACK_TIMEOUT):
+                missing = [key[1] for key in keys if key not in self._feedback]
+                raise Exception(f'No figure of merit reported for {missing} within {AdaptiveScan.FEEDBACK_TIMEOUT}s!')
+            return [self._feedback[key] for key in keys]
+
+    def _refine(self, row, values):
+        values = sorted(values)
+        foms = self._waitFeedback([(row, value) for value in values])
+
+        points = [(value, fom) for value, fom in zip(values, foms) if fom is not None]
+        if len(points) < 2:
+            return []
+
+        x = np.array([point[0] for point in points], dtype=float)
+        y = np.array([point[1] for point in points], dtype=float)
+
+        span = np.max(y) - np.min(y)
+        if span <= 0:
+            return []
+
+        change = np.abs(np.diff(y))/span
+        width = np.diff(x)
+
+        min_step = self.min_step
+        if min_step is None:
+            coarse = self._values[self._inner()]
+            min_step = (max(coarse) - min(coarse))/(len(coarse) - 1)/8
+
+        candidates = [ii for ii in np.argsort(-change) if change[ii] > self.tolerance and width[ii]/2 >= min_step]
+        candidates = candidates[:self.points - len(values)]
+
+        return sorted(float(x[ii] + width[ii]/2) for ii in candidates)
+
+    def __iter__(self):
+        # Generator instead of a Scan.Iterator, the refinement depends on the feedback
+        inner = self._inner()
+        outer = self._parameters[:-1]
+
+        previous = None
+        rows = itertools.product(*[self._values[param] for param in outer])
+        for row, combination in enumerate(rows):
+            base = dict(zip(outer, combination))
+
+            values = list(self._values[inner])
+            batch = list(values)
+            while len(batch) > 0:
+                for value in batch:
+                    state = dict(base)
+                    state[inner] = value
+
+                    yield self._entry(previous, state, (row, value))
+                    previous = state
+
+                batch = self._refine(row, values)
+                values.extend(batch)
+
+    def _entry(self, previous, state, key):
+        if previous is None:
+            changed_param = None
+            manual = any(self._manual.values())
+            autoscale = any(self._autoscale.values())
+            wait = 0
+            settle = None
+        else:
+            # The outermost parameter which changed defines the constraints
+            changed_param = [param for param in self._parameters if state[param] != previous[param]][0]
+            manual = self._manual[changed_param]
+            autoscale = self._autoscale[changed_param]
+            wait = self._wait[changed_param]
+            settle = self._settle[changed_param]
+
+        entry = Scan.Entry(changed_param, state, manual, wait, autoscale, settle)
+        entry.key = key
+        return entry
@@ -0,0 +1,117 @@
+import numpy as np
+import scipy.optimize
+import scipy.stats
+
+from ..data import FigureOfMerit
+
+class AutoFocus():
+    """Finds the focus with the minimal beam width by a golden-section search.
+
+    At every focus position a short edge scan along x is taken, and an ERF is fitted to
+    the figure of merit of the waveforms. Its sigma (the beam width) is minimised over
+    the focus bracket, until the bracket is narrower than `tolerance` (in mm).
+    All acquired entries can be stored in a scan directory, to keep the trajectory."""
+
+    RATIO = (np.sqrt(5) - 1)/2
+
+    def __init__(self, stage, scope, x, focus, tolerance=0.01, fom=FigureOfMerit.INTEGRAL, log=None):
+        if len(x) < 4:
+            raise Exception('The edge scan of the auto-focus needs at least 4 x values!')
+        if len(focus) != 2 or focus[0] >= focus[1]:
+            raise Exception('The focus bracket of the auto-focus needs to be [min, max]!')
+
+        self.stage = stage
+        self.scope = scope
+        self._log = log
+
+        self.x = np.sort(np.array(x, dtype=float))
+        self.focus = [float(focus[0]), float(focus[1])]
+        self.tolerance = float(tolerance)
+        self.fom = FigureOfMerit(fom)
+
+        self.trajectory = []
+
+    def log(self, cat, msg):
+        if self._log is not None:
+            self._log.log(cat, msg)
+
+    def _fitSigma(self, fom):
+        # Same model and initial values as the ERF fit of the analysis
+        def ERF(x, A, B, mu, sigma):
+            return A*scipy.stats.norm.cdf(x, mu, sigma) + B
+
+        B = fom[0]
+        A = fom[-1] - B
+        sign = np.sign(A)
+        mu = self.x[np.argmax(sign*(fom - B) >= sign*0.5*A)]
+        sigma = max(self.x[np.argmax(sign*(fom - B) >= sign*0.8*A)] - mu, np.min(np.diff(self.x)))
+
+        try:
+            popt, pcov = scipy.optimize.curve_fit(ERF, self.x, fom, p0=[A, B, mu, sigma])
+        except RuntimeError:
+            return np.inf
+
+        return abs(popt[3])
+
+    def _evaluate(self, focus, scandir=None):
+        self.stage.FocusMoveTo(focus)
+
+        fom = []
+        for x in self.x:
+            self.stage.PositionMoveTo(x=x)
+            # In sequence mode the figure of merit is averaged over the segments
+            waves = self.scope.SplitWaveform(self.scope.AcquireAverage())
+
+            fom.append(np.mean([self.fom.evaluate(wave.x, wave.y)[0] for wave in waves]))
+
+            if scandir is not None:
+                state = self.stage.ToState({})
+                state['autofocus.step'] = len(self.trajectory)
+                entry = scandir.addEntry(state)
+                entry.storeMetaData(state)
+                for wave in waves:
+                    entry.storeCurve(wave.x, wave.y, metadata=self.scope.WaveToMetadata(wave))
+
+        sigma = self._fitSigma(np.array(fom))
+        self.trajectory.append((focus, sigma))
+        self.log('AutoFocus', f'Focus {focus:.4f}mm: sigma = {sigma*1e3:.2f}um')
+
+        return sigma
+
+    def Run(self, scandir=None):
+        """Runs the search and moves to the best focus found.
+
+        Returns the focus and the beam width (both in mm)."""
+
+        x_start = self.stage.Position()['x']
+        self.trajectory = []
+
+        self.log('AutoFocus', f'Searching focus in [{self.focus[0]}mm, {self.focus[1]}mm] with an edge scan of {len(self.x)} points.')
+
+        a, b = self.focus
+        c = b - AutoFocus.RATIO*(b - a)
+        d = a + AutoFocus.RATIO*(b - a)
+        fc = self._evaluate(c, scandir)
+        fd = self._evaluate(d, scandir)
+
+        while b - a > self.tolerance:
+            # Keep the bracket containing the smaller beam width
+            if fc < fd:
+                b, d, fd = d, c, fc
+                c = b - AutoFocus.RATIO*(b - a)
+                fc = self._evaluate(c, scandir)
+            else:
+                a, c, fc = c, d, fd
+                d = a + AutoFocus.RATIO*(b - a)
+                fd = self._evaluate(d, scandir)
+
+        focus, sigma = min(self.trajectory, key=lambda point: point[1])
+        if not np.isfinite(sigma):
+            raise Exception('Auto-focus failed, no ERF fit converged!')
+
+        self.stage.FocusMoveTo(focus)
+        self.stage.PositionMoveTo(x=x_start)
+
+        self.log('AutoFocus', f'Found focus at {focus:.4f}mm (sigma = {sigma*1e3:.2f}um) after {len(self.trajectory)} steps.')
+
+        return focus, sigma
@@ -1,9 +1,19 @@
 
 class Scan():
 
+    # Iteration order of a parameter, when an outer parameter changes
+    class ORDER:
+        all = ['normal', 'snake', 'travel']
+        # Restart from the first value (odometer order)
+        NORMAL = 'normal'
+        # Reverse the direction (boustrophedon order)
+        SNAKE = 'snake'
+        # Sorted values, starting from the end closest to the start position, then snake order
+        TRAVEL = 'travel'
+
     class Entry():
 
-        def __init__(self, changed_param, state, manual=False, wait=None, autoscale=False):
+        def __init__(self, changed_param, state, manual=False, wait=None, autoscale=False, settle=None):
             self._change = changed_param
             self._state = state
             self._manual = manual
@@ -13,6 +23,10 @@ class Scan():
                 self._wait = 0
 
             self._autoscale = autoscale
+            self._settle = [] if settle is None else settle
+
+            # Identifies the entry for the feedback of an adaptive scan
+            self.key = None
 
         def __str__(self):
             return str(self._state)
@@ -32,12 +46,17 @@ class Scan():
         def isAutoScale(self):
             return self._autoscale
 
+        def settle(self):
+            # Settle conditions, the wait is then the timeout
+            return self._settle
+
     class Iterator():
 
         def __init__(self, scan):
             self._scan = scan
 
             self._index = {param: 0 for param in self._scan._parameters}
+            self._direction = {param: 1 for param in self._scan._parameters}
             self._valid = self._scan.count() > 0
 
             self._last_change = None
@@ -57,24 +76,33 @@ class Scan():
                 manual = any(self._scan._manual.values())
                 autoscale = any(self._scan._autoscale.values())
                 wait = 0
+                settle = None
             else:
                 manual = self._scan._manual[changed_param]
                 autoscale = self._scan._autoscale[changed_param]
                 wait = self._scan._wait[changed_param]
+                settle = self._scan._settle[changed_param]
 
             for param in reversed(self._scan._parameters):
-                if self._index[param]+1 < len(self._scan._values[param]):
-                    self._index[param] += 1
+                step = self._direction[param]
+                if 0 <= self._index[param]+step < len(self._scan._values[param]):
+                    self._index[param] += step
                     self._last_change = param
                     break
-                else:
+                elif self._scan._order[param] == Scan.ORDER.NORMAL:
                     self._index[param] = 0
+                else:
+                    # Reverse the direction, the value stays the same for the next entry
+                    self._direction[param] = -step
             else:
                 # We only get here if we did not break
                 # Therefore we have reached the last element!
                 self._valid = False
 
-            return Scan.Entry(changed_param, result, manual, wait, autoscale)
+            return Scan.Entry(changed_param, result, manual, wait, autoscale, settle)
+
+    # Figure of merit reported via `feedback()`, only used by adaptive scans
+    fom = None
 
     def __init__(self):
 
@@ -83,6 +111,8 @@ class Scan():
         self._manual = {}
         self._wait = {}
         self._autoscale = {}
+        self._order = {}
+        self._settle = {}
 
     def count(self):
         if len(self._parameters) == 0:
@@ -94,17 +124,56 @@ class Scan():
 
         return total
 
-    def addParameter(self, param, values, manual=False, wait=0, autoscale=False):
+    def addParameter(self, param, values, manual=False, wait=0, autoscale=False, order=ORDER.NORMAL, start=None, settle=None):
+        # start: Position of the parameter before the scan, used for order=travel
+        # settle: List of `Settle.Condition`, the wait is used as timeout
         if param in self._parameters:
             raise Exception(f'Trying to add parameter [{param}] a second time to scan!')
         if len(values) < 1:
             raise Exception(f'No values specified for scan paramter [{param}]!')
+        if order not in Scan.ORDER.all:
+            raise Exception(f'Unknown order [{order}] for scan parameter [{param}]!')
+
+        if order == Scan.ORDER.TRAVEL:
+            values = sorted(values)
+            if start is not None and abs(float(start) - values[-1]) < abs(float(start) - values[0]):
+                values = values[::-1]
 
         self._parameters.append(param)
         self._values[param] = values
         self._manual[param] = manual
         self._wait[param] = float(wait)
         self._autoscale[param] = autoscale
+        self._order[param] = order
+        self._settle[param] = settle
+
+    def parameters(self):
+        return list(self._parameters)
+
+    def reorder(self, parameters):
+        # Returns a copy of the scan with the given nesting of the parameters (outermost first)
+        if sorted(parameters) != sorted(self._parameters):
+            raise Exception(f'Reordered parameters {parameters} do not match the scan parameters {self._parameters}!')
+
+        scan = Scan()
+        for param in parameters:
+            scan._parameters.append(param)
+            scan._values[param] = self._values[param]
+            scan._manual[param] = self._manual[param]
+            scan._wait[param] = self._wait[param]
+            scan._autoscale[param] = self._autoscale[param]
+            scan._order[param] = self._order[param]
+            scan._settle[param] = self._settle[param]
+
+        return scan
+
+    def grid(self):
+        # The scan points which are known before the scan
+        return self
+
+    def feedback(self, entry, value):
+        # Figure of merit of an acquired entry (None if it failed)
+        pass
 
     def __iter__(self):
         return Scan.Iterator(self)
@@ -0,0 +1,120 @@
+import itertools
+
+from ..lab.control import BiasSupplyControl
+from .Scan import Scan
+
+class ScanPlanner():
+    """Predicts the duration of a scan from a cost model of the setup and finds the
+    nesting of the scan parameters with the shortest predicted duration.
+
+    Cost model (all times in seconds):
+        - Stage: All axes move simultaneously, the slowest axis defines the move time.
+        - Bias: The HV is ramped with the given ramp rate.
+        - Other parameters: A fixed time per change.
+        - Wait: The constraint wait of the changed parameter.
+        - Acquisition: `scope.average` sweeps at the trigger rate (`laser.frequency`) plus a fixed overhead.
+
+    Manual parameters keep their position in the nesting."""
+
+    STAGE = ['stage.x', 'stage.y', 'stage.focus']
+    BIAS = 'bias.hv'
+
+    DEFAULT_COST = {
+        'ramp': BiasSupplyControl.VOLTAGE_RAMP,     # HV ramp rate [V/s]
+        'stage': 2.0,                               # Stage speed [mm/s]
+        'change': 0.1,                              # Any other parameter change [s]
+        'overhead': 0.5,                            # Transfer, readback and storage per entry [s]
+        'rate': 1000,                               # Trigger rate, if not defined by `laser.frequency` [Hz]
+    }
+
+    # Above this number of nesting permutations, only a heuristic order is evaluated
+    MAX_PERMUTATIONS = 720
+
+    def __init__(self, cost=None):
+        self.cost = dict(ScanPlanner.DEFAULT_COST)
+        if cost is not None:
+            self.cost.update(cost)
+
+    def transition(self, previous, state):
+        time = 0
+
+        stage = [abs(float(state[key]) - float(previous[key])) for key in ScanPlanner.STAGE
+            if key in state and key in previous and state[key] != previous[key]]
+        if len(stage) > 0:
+            time += max(stage)/self.cost['stage']
+
+        for key, value in state.items():
+            if key in ScanPlanner.STAGE or previous.get(key) == value:
+                continue
+
+            if key == ScanPlanner.BIAS and previous.get(key) is not None:
+                time += abs(float(value) - float(previous[key]))/self.cost['ramp']
+            else:
+                time += self.cost['change']
+
+        return time
+
+    def acquisition(self, state):
+        average = float(state.get('scope.average', 1))
+        rate = state.get('laser.frequency')
+        if rate is None:
+            rate = self.cost['rate']
+
+        return average/float(rate) + self.cost['overhead']
+
+    def estimate(self, scan, start={}):
+        """Predicted duration of the scan [s], starting from the `start` state."""
+        state = dict(start)
+
+        total = 0
+        for entry in scan:
+            next_state = dict(state)
+            next_state.update(entry.state())
+
+            total += self.transition(state, next_state) + entry.wait() + self.acquisition(next_state)
+            state = next_state
+
+        return total
+
+    def _candidates(self, scan):
+        parameters = scan.parameters()
+        free = [param for param in parameters if not scan._manual[param]]
+        slots = [pp for pp, param in enumerate(parameters) if not scan._manual[param]]
+
+        def nesting(order):
+            result = list(parameters)
+            for slot, param in zip(slots, order):
+                result[slot] = param
+            return result
+
+        count = 1
+        for nn in range(2, len(free)+1):
+            count *= nn
+
+        if count <= ScanPlanner.MAX_PERMUTATIONS:
+            for order in itertools.permutations(free):
+                yield nesting(order)
+        else:
+            # Heuristic: Most expensive changes in the outermost loop
+            yield parameters
+            yield nesting(sorted(free, key=lambda param: -self._changeCost(scan, param)))
+
+    def _changeCost(self, scan, param):
+        values = scan._values[param]
+        steps = [self.transition({param: a}, {param: b}) for a, b in zip(values[:-1], values[1:])]
+        return scan._wait[param] + (sum(steps)/len(steps) if len(steps) > 0 else 0)
+
+    def plan(self, scan, start={}):
+        """Returns the reordered scan with the shortest predicted duration."""
+        best = scan
+        best_time = self.estimate(scan, start)
+
+        for nesting in self._candidates(scan):
+            candidate = scan.reorder(nesting)
+            time = self.estimate(candidate, start)
+
+            if time < best_time:
+                best = candidate
+                best_time = time
+
+        return best
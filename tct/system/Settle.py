@@ -0,0 +1,103 @@
+import time
+
+import numpy as np
+
+class Settle():
+    """Waits until measured quantities of the setup are stable, instead of a fixed time.
+
+    A condition holds, once its samples cover the last `window` seconds and their
+    spread stays within `tolerance` (relative to the mean) resp. `drift` (absolute).
+    The fixed wait of the scan parameter is used as timeout."""
+
+    QUANTITIES = {
+        'current': lambda setup: setup.bias.SMUCurrent(),
+        'temperature': lambda setup: setup.temp.HolderTemperature(),
+        'humidity': lambda setup: setup.temp.HolderHumidity(),
+        'stage-temperature': lambda setup: setup.temp.StageTemperature(),
+    }
+
+    # Sampling interval (in s)
+    INTERVAL = 0.5
+
+    class Condition():
+
+        def __init__(self, quantity, window, tolerance=None, drift=None):
+            if quantity not in Settle.QUANTITIES:
+                raise Exception(f'Unknown settle quantity [{quantity}]! Valid: {list(Settle.QUANTITIES)}')
+            if (tolerance is None) == (drift is None):
+                raise Exception(f'Settle condition of [{quantity}] needs either a tolerance or a drift!')
+            if window <= 0:
+                raise Exception(f'Settle window of [{quantity}] must be positive!')
+
+            self.quantity = quantity
+            self.window = float(window)
+            self.tolerance = None if tolerance is None else float(tolerance)
+            self.drift = None if drift is None else float(drift)
+
+            self.reset()
+
+        def __str__(self):
+            limit = f'{self.tolerance*100:g}%' if self.tolerance is not None else f'{self.drift:g}'
+            return f'{self.quantity} within {limit} over {self.window:g}s'
+
+        def reset(self):
+            self._samples = []
+
+        def add(self, timestamp, value):
+            self._samples.append((timestamp, value))
+
+            # Keep one sample older than the window, to know that the window is covered
+            while len(self._samples) > 1 and self._samples[1][0] <= timestamp - self.window:
+                self._samples.pop(0)
+
+        def holds(self):
+            if len(self._samples) == 0:
+                return False
+
+            # Quantity not available (e.g. SMU off), nothing to wait for
+            if self._samples[-1][1] is None:
+                return True
+
+            if self._samples[-1][0] - self._samples[0][0] < self.window:
+                return False
+
+            values = np.array([value for stamp, value in self._samples if value is not None], dtype=float)
+            spread = np.max(values) - np.min(values)
+
+            if self.tolerance is not None:
+                return spread <= self.tolerance*np.abs(np.mean(values))
+            else:
+                return spread <= self.drift
+
+
+    def __init__(self, setup, log=None, interval=INTERVAL):
+        self.setup = setup
+        self._log = log
+        self.interval = interval
+
+    def log(self, cat, msg):
+        if self._log is not None:
+            self._log.log(cat, msg)
+
+    def wait(self, conditions, timeout):
+        """Samples the quantities until all conditions hold or the timeout is reached.
+
+        Returns the settle time and whether the conditions were met."""
+
+        for condition in conditions:
+            condition.reset()
+
+        self.log('Settle', 'Waiting for: %s (timeout %gs)'%(', '.join(str(condition) for condition in conditions), timeout))
+
+        start = time.time()
+        while True:
+            for condition in conditions:
+                condition.add(time.time(), Settle.QUANTITIES[condition.quantity](self.setup))
+
+            elapsed = time.time() - start
+            if all(condition.holds() for condition in conditions):
+                return elapsed, True
+            if elapsed >= timeout:
+                return elapsed, False
+
+            time.sleep(min(self.interval, timeout - elapsed))
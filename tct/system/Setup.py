@@ -1,3 +1,4 @@
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
 import os
 import sys
@@ -5,11 +6,19 @@ import socket
 import git
 
 from tct.lab.control import *
-from tct.logger import Logger
+from tct.logger import Logger, Timing
 
 class Setup():
 
-    def __init__(self, vlimit, ilimit, log=None, use_laser=True):
+    # Order in which the instruments are set (serial mode), resp. submitted (concurrent mode)
+    ORDER = ['amp', 'bias', 'scope', 'stage', 'laser', 'temp']
+
+    # Instruments which have to be set before another one is set
+    DEPENDENCIES = {
+        'bias': ['amp'],
+    }
+
+    def __init__(self, vlimit, ilimit, log=None, use_laser=True, cache=True, refresh=None, concurrent=True, timing=None):
 
         if log is None:
             self.log = Logger(print=True, debug=False)
@@ -38,28 +47,85 @@ class Setup():
         # Dummy state to allow for repetition of scans
         self.count = 0
 
+        # Shared cache of the instrument state, see `StateCache`
+        self.cache = StateCache(enabled=cache, refresh=refresh)
+
+        # Time spent in the phases of a scan, see `Timing`
+        self.timing = Timing() if timing is None else timing
+
         # Create the setup control classes
-        self.stage = StageControl(log = self.log)
+        self.stage = StageControl(log = self.log, cache = self.cache, timing = self.timing)
         if use_laser:
-            self.laser = ParticularsLaserControl(log = self.log)
+            self.laser = ParticularsLaserControl(log = self.log, cache = self.cache)
         else:
             self.laser = None
-        self.amp = ParticularsAmplifierControl(log = self.log)
-        self.bias = BiasSupplyControl(VLimit = vlimit, ILimit = ilimit, log = self.log)
-        self.scope = ScopeControl(log = self.log)
-        self.temp = TemperatureControl(log = self.log)
+        self.amp = ParticularsAmplifierControl(log = self.log, cache = self.cache)
+        self.bias = BiasSupplyControl(VLimit = vlimit, ILimit = ilimit, log = self.log, cache = self.cache, timing = self.timing)
+        self.scope = ScopeControl(log = self.log, cache = self.cache, timing = self.timing)
+        self.temp = TemperatureControl(log = self.log, cache = self.cache)
+
+        # Every instrument has its own link, the state can therefore be applied concurrently
+        self._executor = None
+        if concurrent:
+            self._executor = ThreadPoolExecutor(max_workers=len(Setup.ORDER), thread_name_prefix='Setup')
+
+    def _controls(self):
+        controls = {
+            'amp': self.amp,
+            'bias': self.bias,
+            'scope': self.scope,
+            'stage': self.stage,
+            'laser': self.laser,
+            'temp': self.temp,
+        }
+        return [(name, controls[name]) for name in Setup.ORDER if controls[name] is not None]
+
+    def _applyState(self, state):
+        if self._executor is None:
+            for name, control in self._controls():
+                control.FromState(state)
+            return
+
+        def apply(control, dependencies):
+            # Raises the exception of a failed dependency, the control is then not set
+            for dependency in dependencies:
+                dependency.result()
+            control.FromState(state)
+
+        # Submitted in order, so that the dependencies are always submitted first
+        futures = {}
+        for name, control in self._controls():
+            dependencies = [futures[dep] for dep in Setup.DEPENDENCIES.get(name, []) if dep in futures]
+            futures[name] = self._executor.submit(apply, control, dependencies)
+
+        # Join all transitions, before the first exception is raised
+        wait(futures.values())
+        for future in futures.values():
+            future.result()
+
+    def InvalidateCache(self, key=None):
+        # Forces a re-query of all (or the given) instrument values on the next access
+        self.cache.invalidate(key)
+
+    def ToState(self, state=None):
+        if state is None:
+            state = {}
 
-    def ToState(self, state={}):
         state['time'] = datetime.now().isoformat()
         state['count'] = self.count
 
-        self.scope.ToState(state)
-        self.stage.ToState(state)
-        if self.laser is not None:
-            self.laser.ToState(state)
-        self.amp.ToState(state)
-        self.bias.ToState(state)
-        self.temp.ToState(state)
+        try:
+            with self.timing.measure('readback'):
+                self.scope.ToState(state)
+                self.stage.ToState(state)
+                if self.laser is not None:
+                    self.laser.ToState(state)
+                self.amp.ToState(state)
+                self.bias.ToState(state)
+                self.temp.ToState(state)
+        except:
+            self.InvalidateCache()
+            raise
 
         state.update(self._manual)
         state.update(self._system)
@@ -67,13 +133,17 @@ class Setup():
         return state
 
     def FromState(self, state):
-        self.scope.FromState(state)
-        self.stage.FromState(state)
-        if self.laser is not None:
-            self.laser.FromState(state)
-        self.amp.FromState(state)
-        self.bias.FromState(state)
-        self.temp.FromState(state)
+        try:
+            # Returns only after all instruments reached the new state
+            with self.timing.measure('state'):
+                self._applyState(state)
+
+            if self.laser is not None and 'laser.frequency' in state:
+                self.scope.SetTriggerRate(float(state['laser.frequency']))
+        except:
+            # The instruments might be in an unknown (partially set) state
+            self.InvalidateCache()
+            raise
 
         if 'count' in state:
             self.count = int(state['count'])
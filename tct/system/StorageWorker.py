@@ -0,0 +1,67 @@
+import queue
+import threading
+import traceback
+
+class StorageWorker():
+    """Runs storage tasks (parsing and writing of scan entries) in a background thread.
+
+    Tasks are executed strictly in the order they were submitted, so the
+    entries end up in the scan directory in the same order as acquired.
+    The queue depth is limited, so that the acquisition can not run away
+    from the storage if writing is slower than acquiring."""
+
+    def __init__(self, log=None, depth=2):
+        self._log = log
+
+        self._queue = queue.Queue(maxsize=depth)
+        self._errors = []
+        self._lock = threading.Lock()
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def log(self, cat, msg):
+        if self._log is not None:
+            self._log.log(cat, msg)
+
+    def _run(self):
+        while True:
+            task = self._queue.get()
+            if task is None:
+                self._queue.task_done()
+                break
+
+            fct, args, kwargs = task
+            try:
+                fct(*args, **kwargs)
+            except:
+                with self._lock:
+                    self._errors.append(traceback.format_exc())
+            finally:
+                self._queue.task_done()
+
+    def submit(self, fct, *args, **kwargs):
+        if not self._thread.is_alive():
+            raise Exception('Storage worker is not running anymore!')
+
+        # Blocks if the queue is full
+        self._queue.put((fct, args, kwargs))
+
+    def errors(self):
+        """Returns (and clears) the tracebacks of all failed tasks."""
+        with self._lock:
+            errors = self._errors
+            self._errors = []
+
+        return errors
+
+    def pending(self):
+        return self._queue.unfinished_tasks
+
+    def join(self):
+        """Waits for all submitted tasks to finish and stops the worker thread."""
+        if self._thread.is_alive():
+            if self.pending() > 0:
+                self.log('Storage', f'Waiting for {self.pending()} pending storage tasks.')
+            self._queue.put(None)
+            self._thread.join()
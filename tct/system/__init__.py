@@ -1,2 +1,7 @@
 from .Setup import Setup
 from .Scan import Scan
+from .AdaptiveScan import AdaptiveScan
+from .StorageWorker import StorageWorker
+from .ScanPlanner import ScanPlanner
+from .Settle import Settle
+from .AutoFocus import AutoFocus
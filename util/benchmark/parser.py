@@ -0,0 +1,63 @@
+import argparse
+import timeit
+from pathlib import Path
+
+import numpy as np
+
+from tct.lab.Lecroy import WaveDesc
+
+# Benchmark of the native `WaveDesc` parser against `lecroyparser`.
+#
+# Usage:
+#   python -m util.benchmark.parser [FILE.trc ...]
+#
+# Without any files, synthetic waveform byte-streams of different lengths are used.
+
+parser = argparse.ArgumentParser(description='Benchmark of the LeCroy waveform parsers.')
+parser.add_argument('files', nargs='*',
+                    help='Recorded waveform files (.trc or raw `WF?` responses).')
+parser.add_argument('--samples', '-S', type=int, nargs='+', default=[1000, 10000, 100000, 1000000],
+                    help='Number of samples of the synthetic waveforms.')
+parser.add_argument('--repeat', '-R', type=int, default=20,
+                    help='Number of repetitions per measurement.')
+
+args = parser.parse_args()
+
+try:
+    import lecroyparser
+except ImportError:
+    lecroyparser = None
+    print('WARNING: lecroyparser is not installed, only the native parser is benchmarked!\n')
+
+
+streams = []
+if len(args.files) > 0:
+    for file in args.files:
+        streams.append((Path(file).name, Path(file).read_bytes()))
+else:
+    rng = np.random.default_rng(0)
+    for samples in args.samples:
+        codes = (rng.normal(0, 500, samples)).astype(np.int16)
+        streams.append((f'synthetic {samples} samples', WaveDesc.build(codes, 1.5e-5, 0.01, 5e-11, -20e-9)))
+
+
+def measure(fct):
+    # Best time of the repetitions [s]
+    return min(timeit.repeat(fct, number=1, repeat=args.repeat))
+
+
+print('{:<32}{:>16}{:>16}{:>16}{:>10}'.format('Waveform', 'lecroyparser', 'WaveDesc', 'WaveDesc (y)', 'Speedup'))
+for name, raw in streams:
+    native = measure(lambda: WaveDesc(raw).samples)
+    native_y = measure(lambda: WaveDesc(raw).y)
+
+    if lecroyparser is not None:
+        reference = measure(lambda: lecroyparser.ScopeData(data=raw).y)
+
+        # Both parsers must yield the same amplitudes
+        if not np.allclose(lecroyparser.ScopeData(data=raw).y, WaveDesc(raw).y, rtol=1e-6, atol=1e-9):
+            print(f'WARNING: Parsed amplitudes of [{name}] do not agree!')
+
+        print('{:<32}{:>14.1f}us{:>14.1f}us{:>14.1f}us{:>9.0f}x'.format(name, reference*1e6, native*1e6, native_y*1e6, reference/native))
+    else:
+        print('{:<32}{:>16}{:>14.1f}us{:>14.1f}us{:>10}'.format(name, '-', native*1e6, native_y*1e6, '-'))
@@ -0,0 +1,129 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+import git
+import yaml
+
+# Benchmark of the scan throughput against the emulated instruments (see `tct/lab/emulator`).
+#
+# Usage:
+#   python -m util.benchmark.scan [CONFIG.yml ...] [--profile PROFILE.yml] [--results FILE.yml]
+#
+# Each config is run with `util/scan.py` in batch mode. The time spent per phase of the entries
+# (see `Timing`) is read from the `timing.yaml` of the scan, the phases of other threads are listed separately. With --results the measurements are
+# appended to a file and compared to the previous run of the same config and profile, e.g. of an
+# earlier commit.
+
+BENCHMARK = Path(__file__).parent
+ROOT = BENCHMARK.parent.parent
+
+parser = argparse.ArgumentParser(description='Benchmark of the scan throughput with emulated instruments.')
+parser.add_argument('configs', nargs='*', default=sorted(str(config) for config in (BENCHMARK / 'configs').glob('*.yml')),
+                    help='Scan configs to run. Default: all configs in [util/benchmark/configs]')
+parser.add_argument('--profile', default=str(BENCHMARK / 'profiles' / 'lab.yml'),
+                    help='Latency profile of the emulated instruments. Default: [util/benchmark/profiles/lab.yml]')
+parser.add_argument('--pipeline', '-P', action='store_true',
+                    help='Run the scans in pipelined mode.')
+parser.add_argument('--results', '-R', default=None,
+                    help='Append the results to this file and compare them to the previous run.')
+parser.add_argument('--data', '-D', default=None,
+                    help='Directory for the scan data. Default: a temporary directory')
+
+args = parser.parse_args()
+
+
+def runScan(config, data):
+    env = dict(os.environ)
+    env['TCT_EMULATOR'] = str(Path(args.profile).resolve())
+    env['PYTHONPATH'] = os.pathsep.join([str(ROOT), env.get('PYTHONPATH', '')])
+
+    cmd = [sys.executable, str(ROOT / 'util' / 'scan.py'), str(config), '--batch', '--quiet', '--data', str(data)]
+    if args.pipeline:
+        cmd.append('--pipeline')
+
+    before = set(Path(data).iterdir()) if Path(data).is_dir() else set()
+    result = subprocess.run(cmd, env=env, cwd=ROOT, capture_output=True, text=True)
+
+    scans = [folder for folder in set(Path(data).iterdir()) - before if (folder / 'meta' / 'timing.yaml').is_file()]
+    if result.returncode != 0 or len(scans) != 1:
+        print(result.stdout[-2000:])
+        print(result.stderr[-2000:])
+        raise Exception(f'Scan of [{config}] failed!')
+
+    with open(scans[0] / 'meta' / 'timing.yaml', 'r') as stream:
+        return yaml.safe_load(stream)
+
+def previousResult(results, record):
+    for previous in reversed(results):
+        if previous['config'] == record['config'] and previous['profile'] == record['profile'] and previous['pipeline'] == record['pipeline']:
+            return previous
+    return None
+
+def printResult(record, previous):
+    def change(value, reference):
+        if reference is None or reference == 0:
+            return ''
+        return f' ({(value/reference - 1)*100:+.1f}%)'
+
+    timing = record['timing']
+    reference = previous['timing'] if previous is not None else None
+
+    print(f'{record["config"]}: {timing["entries"]} entries in {timing["elapsed"]:.1f}s')
+    print(f'  Throughput: {timing["entries_per_hour"]:.0f} entries/h' + change(timing['entries_per_hour'], reference['entries_per_hour'] if reference else None))
+
+    def printPhases(group):
+        for phase, stats in sorted(timing.get(group, {}).items(), key=lambda item: -item[1]['total']):
+            per_entry = stats['total']/max(timing['entries'], 1)
+            before = None
+            if reference is not None and phase in reference.get(group, {}):
+                before = reference[group][phase]['total']/max(reference['entries'], 1)
+            print('  {:<12}{:>12.1f}ms{:>9.1f}%{}'.format(phase, per_entry*1e3, stats['fraction']*100, change(per_entry, before)))
+
+    # Time per entry of each phase, these add up to the elapsed time
+    print('  {:<12}{:>14}{:>10}'.format('Phase', 'per entry', 'fraction'))
+    printPhases('phases')
+    if 'untimed' in timing:
+        print('  {:<12}{:>12.1f}ms{:>9.1f}%'.format('untimed', timing['untimed']/max(timing['entries'], 1)*1e3, timing['untimed']/timing['elapsed']*100))
+
+    # Phases in other threads (e.g. the storage worker), overlapping with the ones above
+    if len(timing.get('concurrent', {})) > 0:
+        print('  Concurrent:')
+        printPhases('concurrent')
+
+    if previous is not None:
+        print(f'  Compared to [{previous["commit"][:8]}] from {previous["date"]}')
+    print()
+
+
+repo = git.Repo(ROOT, search_parent_directories=True)
+commit = repo.head.object.hexsha + ('-dirty' if repo.is_dirty() else '')
+
+results = []
+if args.results is not None and Path(args.results).is_file():
+    with open(args.results, 'r') as stream:
+        results = yaml.safe_load(stream) or []
+
+with tempfile.TemporaryDirectory() as tmp:
+    data = Path(args.data) if args.data is not None else Path(tmp)
+
+    for config in args.configs:
+        record = {
+            'config': Path(config).name,
+            'profile': Path(args.profile).name,
+            'pipeline': args.pipeline,
+            'commit': commit,
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'timing': runScan(config, data),
+        }
+
+        printResult(record, previousResult(results, record))
+        results.append(record)
+
+if args.results is not None:
+    with open(args.results, 'w') as stream:
+        yaml.dump(results, stream, sort_keys=False)
@@ -27,6 +27,8 @@ if __name__ == "__main__":
                         help='Current limit for the high-voltage PSU [mA].')
     parser.add_argument('--no-laser', dest='laser', action='store_false',
                         help='Do not use the laser - For source type operations!')
+    parser.add_argument('--data', '-D', default='./_data',
+                        help='The directory where the data (e.g. of the auto-focus) will be placed. Default: [./_data]')
 
     args = parser.parse_args()
 
@@ -42,11 +44,18 @@ if __name__ == "__main__":
     # Create a logger
     log = Logger('.tct_cli.log', print=True, debug=False)
 
+    # The scope is shared by the handlers (e.g. the auto-focus of the stage)
+    try:
+        scope = ScopeControl(log=log)
+    except Exception as e:
+        printWarning(f'Scope not available: {e}')
+        scope = None
+
     # Create all Command Handlers
     handlers = {}
     handlers['amp'] = AmpHandler(log=log)
     handlers['bias'] = BiasHandler(VLimit=args.vlimit, ILimit=args.ilimit*1e-3, log=log)
-    handlers['stage'] = StageHandler(log=log)
+    handlers['stage'] = StageHandler(log=log, data=args.data, scope=scope)
     handlers['temp'] = TempHandler(log=log)
 
     # TODO Implement Scope Handler / Unify with viewer
@@ -1,15 +1,21 @@
 from .CommandHandler import CommandHandler
 
 import prompt_toolkit as pt
+import numpy as np
 
 from tct.lab.control import StageControl
+from tct.data import DataDir
+from tct.system import AutoFocus
 
 class StageHandler(CommandHandler):
 
-    def __init__(self, log):
+    def __init__(self, log, data='./_data', scope=None):
         super().__init__(log)
 
         self._stage = StageControl(log=log)
+        # The scope control of the CLI, only needed for the auto-focus
+        self._scope = scope
+        self._data = data
 
     def commandDict(self):
         return {
@@ -22,6 +28,7 @@ class StageHandler(CommandHandler):
             },
             'position': None,
             'state': None,
+            'focus': None,
         }
 
     def _parsePosition(self, input):
@@ -78,5 +85,33 @@ class StageHandler(CommandHandler):
 
                 return self.Text(text)
 
+            elif input[0] in ['focus']:
+                # focus <z min> <z max> <x min> <x max> [points] [tolerance]
+                if len(input) < 5:
+                    raise self.Exception('Usage: focus <z min> <z max> <x min> <x max> [points] [tolerance]')
+
+                points = int(input[5]) if len(input) > 5 else 21
+                tolerance = float(input[6]) if len(input) > 6 else 0.01
+                x = np.linspace(float(input[3]), float(input[4]), points)
+
+                if self._scope is None:
+                    raise self.Exception('No scope available for the auto-focus')
+
+                scandir = DataDir(self._data).createScan('autofocus')
+                try:
+                    autofocus = AutoFocus(self._stage, self._scope, x, [float(input[1]), float(input[2])], tolerance, log=self._log)
+                    focus, sigma = autofocus.Run(scandir)
+                except Exception as e:
+                    return self.Error(f'Auto-focus failed: {e}')
+                finally:
+                    scandir.writeList()
+                    scandir.close()
+
+                return self.Text([
+                    f'Focus:    {focus:.4f}mm',
+                    f'Sigma:    {sigma*1e3:.2f}um',
+                    f'Data:     {scandir.folder}',
+                ])
+
         except CommandHandler.Exception as e:
             return self.Error(str(e))
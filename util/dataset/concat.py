@@ -143,8 +143,10 @@ if __name__ == "__main__":
                 output_list.iloc[current_entry] = line
 
                 prefix = f'A{current_entry}'
-                output_list['_prefix'].iloc[current_entry] = prefix
-                scan.get(index).copy(output_scan.data / prefix)
+                output_list.at[current_entry, '_prefix'] = prefix
+                # Entries of single-file scans are copied as separate files, entries without curves are only listed
+                if line['_type'] != analysis.data.Scan.TYPE_NONE:
+                    output_list.at[current_entry, '_type'] = scan.get(index).copy(output_scan.data / prefix)
 
                 current_entry += 1
 
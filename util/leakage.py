@@ -50,6 +50,11 @@ if not args.show_plot or args.batch:
 # Import TCT related classes
 from tct.system import Setup
 from tct.logger import Logger
+from tct.lab.Keithley import SMU2410
+
+# All measurements at a voltage are stored in the SMU buffer
+if args.measurements < 1 or args.measurements > SMU2410.BUFFER_SIZE:
+    parser.error(f'--measurements must be between 1 and {SMU2410.BUFFER_SIZE} (SMU buffer size)!')
 
 
 # Handle the input and output data structures
@@ -88,9 +93,8 @@ for bb, bias in enumerate(bias_voltages):
     try:
         setup.bias.SMURampVoltage(bias)
 
-        for mm in range(args.measurements):
-            time.sleep(0.1)
-            leakage_current[bb, mm] = setup.bias.SMUCurrent()
+        # All measurements are taken and transferred in one sequence of the SMU
+        leakage_current[bb, :] = setup.bias.SMUCurrentBuffered(args.measurements, delay=0.1)
 
     except KeyboardInterrupt:
         log.log('SCAN', f'WARNING: Received Ctrl+C!')
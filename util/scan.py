@@ -4,6 +4,8 @@ import sys
 import time
 import traceback
 
+import numpy as np
+
 # Parse the command line arguments
 parser = argparse.ArgumentParser(description='Command-Line Interface (CLI) for the TCT Setup')
 parser.add_argument('config',
@@ -24,6 +26,8 @@ parser.add_argument('--ignore-manual', action='store_true',
                     help='Ignores any manual scan steps.')
 parser.add_argument('--batch', '-B', action='store_true',
                     help='Combines --no-confirm, --abort-on-error, --no-show and --ignore-manual')
+parser.add_argument('--pipeline', '-P', action='store_true',
+                    help='Parse and store the acquired data in the background, while the setup already moves to the next scan point.')
 
 args = parser.parse_args()
 
@@ -36,16 +40,16 @@ if not args.show_plot or args.batch:
 
 
 # Import TCT related classes
-from tct.data import DataDir
+from tct.data import DataDir, ScanDir
 from tct.config import ScanFile
-from tct.system import Setup
+from tct.system import Setup, Scan, StorageWorker, ScanPlanner, Settle, AutoFocus
 
 
 # Handle the input and output data structures
 scanfile = ScanFile(args.config)
 datadir = DataDir(args.data)
 
-scandir = datadir.createScan(scanfile.meta['name'])
+scandir = datadir.createScan(scanfile.meta['name'], type=ScanDir.outputType(scanfile.output.type))
 
 # Save the config and metadata file in the scan directory
 scandir.saveConfig(scanfile)
@@ -69,7 +73,8 @@ if args.confirm and not args.batch:
         sys.exit(-1)
 
 # Create the setup and load the initial state
-setup = Setup(vlimit = scanfile.limits['vlimit'], ilimit = scanfile.limits['ilimit'], log=log, use_laser=scanfile.mode.laser())
+setup = Setup(vlimit = scanfile.limits['vlimit'], ilimit = scanfile.limits['ilimit'], log=log, use_laser=scanfile.mode.laser(),
+    cache=scanfile.cache.enabled, refresh=scanfile.cache.refresh)
 setup.FromState(scanfile.setup)
 
 setup.amp.AmpOn()
@@ -77,23 +82,182 @@ setup.bias.SMUOn()
 if scanfile.mode.laser():
     setup.laser.LaserOn()
 
-# TODO: Handle Scope Setup
+# Parsing and storing of an acquired entry.
+# In pipelined mode this is executed in the storage worker thread, therefore
+# no instrument must be accessed in here! Except reading a buffered trace
+# from the scope memory, the scope interface is locked against concurrent queries.
+def storeEntry(scan_entry, state, raw, record=None):
+    fom = None
+    # The phases are timed for this entry, also if the next one is already acquired
+    with setup.timing.record(record):
+        try:
+            # Feature mode entry without a transferred waveform, only listed
+            # In feature mode the figure of merit is the one measured by the scope, also if the waveform was transferred
+            if scan.fom is not None and scanfile.scope.featureMode():
+                fom = state.get(f'scope.measure.{scan.fom.fom}')
+
+            if raw is None:
+                with setup.timing.measure('write'):
+                    scandir.addEntry(state, data=False, timing=record)
+                return
+
+            # In buffered mode the trace is read from the scope memory here
+            if scanfile.scope.buffered:
+                raw = raw.read(parse=False)
+
+            # Store the metadata and acquired curve
+            with setup.timing.measure('write'):
+                entry = scandir.addEntry(state, timing=record)
+                entry.storeMetaData(state)
+
+            # Every channel, and in sequence mode every segment, is stored as a separate curve of the entry
+            foms = []
+            for cc, raw_channel in enumerate(setup.scope.SplitChannels(raw)):
+                with setup.timing.measure('parse'):
+                    waves = setup.scope.SplitWaveform(setup.scope.ParseWaveform(raw_channel))
+
+                for wave in waves:
+                    # The figure of merit of an adaptive scan (first channel), averaged over the segments
+                    if scan.fom is not None and cc == 0 and not scanfile.scope.featureMode():
+                        foms.append(scan.fom.evaluate(wave.x + scanfile.delay, wave.y)[0])
+
+                    # The delay allows to shift the trigger (t=0) point.
+                    # Allows to make the pulse more uniform in time between laser and source measurements
+                    with setup.timing.measure('write'):
+                        if scanfile.output.raw():
+                            codes, gain, offset, interval, start = setup.scope.WaveToRaw(wave)
+                            entry.storeCurveRaw(codes, gain, offset, interval, start + scanfile.delay, metadata=setup.scope.WaveToMetadata(wave))
+                        else:
+                            if scanfile.delay != 0:
+                                wave.x += scanfile.delay
+                            entry.storeCurve(wave.x, wave.y, metadata=setup.scope.WaveToMetadata(wave))
+
+            if len(foms) > 0:
+                fom = float(np.mean(foms))
+        finally:
+            # An adaptive scan waits for the figure of merit of every entry
+            scan.feedback(scan_entry, fom)
+
+def acquire():
+    if scanfile.scope.sequence():
+        return setup.scope.AcquireSequence(parse=False)
+    elif scanfile.scope.adaptive():
+        return setup.scope.AcquireAdaptive(scanfile.scope.fom, scanfile.scope.error, scanfile.scope.min_sweeps, parse=False)
+    elif scanfile.scope.buffered:
+        return setup.scope.AcquireBuffered()
+    else:
+        return setup.scope.AcquireAverage(parse=False)
+
+# In feature mode the waveform is only transferred every N-th entry or if a feature crosses its threshold
+def transferWaveform(index, features, previous):
+    if scanfile.scope.every > 0 and index % scanfile.scope.every == 0:
+        return True
+
+    if previous is not None:
+        for feature, threshold in scanfile.scope.threshold.items():
+            if (features[feature] >= threshold) != (previous[feature] >= threshold):
+                return True
+
+    return False
+
+settle = Settle(setup, log=log)
+
+worker = None
+if args.pipeline:
+    log.log('SCAN', 'Storing the data in pipelined mode.')
+    worker = StorageWorker(log=log)
 
 log.log('SCAN', 'Start scan.')
 
 aborted = False
 
+# The scope setup applies to the auto-focus as well
+setup.scope.SetChannels(scanfile.scope.channels)
+setup.scope.SetSequence(scanfile.scope.segments)
+if scanfile.scope.featureMode():
+    setup.scope.SetFeatures(scanfile.scope.features)
+elif scanfile.scope.buffered:
+    # The extent and clipping of the buffered traces are measured by the scope
+    setup.scope.SetFeatures([])
+if scanfile.scope.window is not None:
+    setup.scope.SetTransferWindow(**scanfile.scope.window)
+
+# Find the focus before the scan, the trajectory of the search is stored as a separate scan
+if scanfile.autofocus is not None:
+    focusdir = datadir.createScan(scanfile.meta['name'] + ' autofocus')
+    focusdir.saveConfig(scanfile)
+    focusdir.writeMetaData(scanfile.meta)
+
+    try:
+        autofocus = AutoFocus(setup.stage, setup.scope, log=log, **scanfile.autofocus)
+        focus, sigma = autofocus.Run(focusdir)
+    except KeyboardInterrupt:
+        log.log('SCAN', f'WARNING: Received Ctrl+C!')
+        aborted = True
+    except:
+        log.log('SCAN', f'ERROR: Exception during auto-focus:\n{traceback.format_exc()}')
+        if args.abort_on_error or args.batch:
+            aborted = True
+    finally:
+        focusdir.writeList()
+        focusdir.close()
+
 run_entries = 0
 run_time = 0
 
-scan = scanfile.getScan()
+# An aborted auto-focus skips all scan entries
+scan = scanfile.getScan() if not aborted else Scan()
+
+# Predict the scan duration and optionally optimize the nesting of the parameters
+planner = ScanPlanner(scanfile.plan)
+predicted = planner.estimate(scan.grid(), scanfile.setup)
+if scanfile.plan is not None and not aborted:
+    scan = planner.plan(scan, scanfile.setup)
+    planned = planner.estimate(scan, scanfile.setup)
+
+    log.log('SCAN', f'Planned parameter nesting: {scan.parameters()}')
+    log.log('SCAN', f'Predicted time saving: {int((predicted-planned)/60):02}:{int((predicted-planned)%60):02}')
+    predicted = planned
+log.log('SCAN', f'Predicted scan time: {int(predicted/60):02}:{int(predicted%60):02}')
+if scanfile.refine.enabled() and not aborted:
+    log.log('SCAN', f'Refining [{scan.parameters()[-1]}] up to {scanfile.refine.points} points by {scan.fom}, the prediction covers the coarse grid only.')
+
 total_entries = scan.count()
-for ee, scan_entry in enumerate(scan):
+previous_features = None
+
+# Only the phases of the scan entries are timed
+setup.timing.reset()
+entries = iter(scan)
+ee = 0
+while True:
+    # An adaptive scan waits for the feedback of the stored entries before the next one
+    try:
+        scan_entry = next(entries)
+    except StopIteration:
+        break
+    except KeyboardInterrupt:
+        log.log('SCAN', f'WARNING: Received Ctrl+C!')
+        aborted = True
+        break
+    except:
+        log.log('SCAN', f'ERROR: Exception during scan:\n{traceback.format_exc()}')
+        aborted = True
+        break
+
+    if worker is not None:
+        errors = worker.errors()
+        for error in errors:
+            log.log('SCAN', f'ERROR: Exception during storage:\n{error}')
+        if len(errors) > 0 and (args.abort_on_error or args.batch):
+            aborted = True
+            break
+
     log.log('SCAN', f'Scan entry [{ee} of {total_entries}]: {scan_entry}')
     if run_entries > 0:
         time_left = (total_entries - (ee+1))*run_time/run_entries
         log.log('SCAN', f'Time remaining: {int(time_left/60):02}:{int(time_left%60):02}')
     time_start = time.time()
+    record = setup.timing.begin()
 
     # Handle change of manual parameters
     if scan_entry.isManual() and not args.ignore_manual and not args.batch:
@@ -111,49 +275,105 @@ for ee, scan_entry in enumerate(scan):
         setup.FromState(scan_entry.state())
 
         # Handle of wait (after state change)
-        if scan_entry.wait() > 0:
-            log.log('SCAN', f'Waiting for {scan_entry.wait()}s')
-            time.sleep(scan_entry.wait())
-            log.log('SCAN', f'Continue after wait.')
-
+        settle_time = None
+        with setup.timing.measure('settle'):
+            if len(scan_entry.settle()) > 0:
+                settle_time, settled = settle.wait(scan_entry.settle(), scan_entry.wait())
+                if settled:
+                    log.log('SCAN', f'Settled after {settle_time:.1f}s')
+                else:
+                    log.log('SCAN', f'WARNING: Not settled within the timeout of {scan_entry.wait()}s, continue.')
+            elif scan_entry.wait() > 0:
+                log.log('SCAN', f'Waiting for {scan_entry.wait()}s')
+                time.sleep(scan_entry.wait())
+                log.log('SCAN', f'Continue after wait.')
+
+        # The range is predicted from the previous waveform, a probe acquisition is only needed if it was clipped
         if scan_entry.isAutoScale():
-            setup.scope.AutoScale()
-
-        wave = setup.scope.AcquireAverage()
-
-        # This allows to shift the trigger (t=0) point.
-        # Allows to make the pulse more uniform in time between laser and source measurements
-        if scanfile.delay != 0:
-            wave.x += scanfile.delay
-
-        # Store the metadata and acquired curve
+            with setup.timing.measure('autoscale'):
+                setup.scope.PredictScale()
+
+        features = {}
+        if scanfile.scope.featureMode():
+            features = setup.scope.AcquireFeatures()
+            if scan_entry.isAutoScale() and setup.scope.IsClipped():
+                log.log('SCAN', 'Features are clipped, scale and acquire again.')
+                with setup.timing.measure('autoscale'):
+                    setup.scope.AutoScale()
+                features = setup.scope.AcquireFeatures()
+            raw = None
+            if transferWaveform(ee, features, previous_features):
+                raw = setup.scope.ReadWaveform(parse=False)
+            previous_features = features
+        else:
+            raw = acquire()
+            if scan_entry.isAutoScale() and setup.scope.IsClipped():
+                log.log('SCAN', 'Waveform is clipped, scale and acquire again.')
+                if scanfile.scope.buffered:
+                    raw.discard()
+                with setup.timing.measure('autoscale'):
+                    setup.scope.AutoScale()
+                raw = acquire()
+
+        # The state has to be read back before the setup moves to the next entry
         state = setup.ToState()
-        entry = scandir.addEntry(state)
-        entry.storeMetaData(state)
-        entry.storeCurve(wave.x, wave.y, metadata=setup.scope.WaveToMetadata(wave))
+        state.update(features)
+        if settle_time is not None:
+            state['settle.time'] = settle_time
+
+        if worker is not None:
+            worker.submit(storeEntry, scan_entry, state, raw, record)
+        else:
+            storeEntry(scan_entry, state, raw, record)
     except KeyboardInterrupt:
         log.log('SCAN', f'WARNING: Received Ctrl+C!')
         aborted = True
         break
     except:
         log.log('SCAN', f'ERROR: Exception during scan:\n{traceback.format_exc()}')
+        setup.InvalidateCache()
+        scan.feedback(scan_entry, None)
         if args.abort_on_error or args.batch:
             aborted = True
             break
 
+    ee += 1
     run_entries += 1
     run_time += time.time() - time_start
 
+setup.timing.end()
+
 if aborted:
     log.log('SCAN', 'Aborting scan!')
 
+if worker is not None:
+    # Make sure all acquired entries are written before the list is created
+    worker.join()
+    for error in worker.errors():
+        log.log('SCAN', f'ERROR: Exception during storage:\n{error}')
 
 scandir.writeList()
+
+timing = setup.timing.summary(run_entries)
+scandir.writeTiming(timing)
+
+scandir.close()
 log.log('SCAN', 'Finished the scan.')
 log.log('SCAN', f'Total time: {int(run_time/60):02}:{int(run_time%60):02}')
+log.log('SCAN', f'Throughput: {timing["entries_per_hour"]:.0f} entries/h')
+for phase, stats in sorted(timing['phases'].items(), key=lambda item: -item[1]['total']):
+    log.log('SCAN', f'  {phase:<10} {stats["total"]:9.2f}s ({stats["fraction"]*100:4.1f}%), {stats["mean"]*1e3:8.1f}ms x {stats["count"]}')
+log.log('SCAN', f'  {"untimed":<10} {timing["untimed"]:9.2f}s ({timing["untimed"]/max(timing["elapsed"], 1e-9)*100:4.1f}%)')
+if len(timing['concurrent']) > 0:
+    log.log('SCAN', 'Concurrent phases (in parallel to the above):')
+    for phase, stats in sorted(timing['concurrent'].items(), key=lambda item: -item[1]['total']):
+        log.log('SCAN', f'  {phase:<10} {stats["total"]:9.2f}s ({stats["fraction"]*100:4.1f}%), {stats["mean"]*1e3:8.1f}ms x {stats["count"]}')
 
 # Handle end of state
 log.log('SCAN', 'Applying end-state.')
+setup.scope.SetSequence(1)
+if scanfile.scope.window is not None:
+    setup.scope.SetTransferWindow()
 if isinstance(scanfile.end, dict):
     setup.FromState(scanfile.end)
 else: